@@ -69,7 +69,7 @@ def register_routes(app):
             recent_transactions = Transaction.query.order_by(desc(Transaction.date)).limit(10).all()
 
             # Get accounts
-            accounts = Account.query.filter_by(is_active=True).all()
+            accounts = Account.query.options(db.undefer(Account.transaction_count)).filter_by(is_active=True).all()
 
             # Define categories and options for modals
             expense_categories = [
@@ -170,8 +170,9 @@ def register_routes(app):
                     )
                 )
 
-            # Always join Account table for filtering
-            query = query.outerjoin(Account)
+            # Always join Account table for filtering, and fill transaction.account from the
+            # same join so the template doesn't lazy-load each row's account
+            query = query.outerjoin(Account).options(db.contains_eager(Transaction.account))
 
             if account_filter:
                 # Filter by tags JSON field or account table
@@ -293,8 +294,11 @@ def register_routes(app):
     def api_get_transactions():
         """API endpoint to get transaction data"""
         try:
-            transactions = Transaction.query.order_by(desc(Transaction.date)).limit(100).all()
-            return jsonify([t.to_dict() for t in transactions])
+            # Read-only listing: serialize plain rows instead of hydrating ORM objects
+            rows = db.session.execute(
+                Transaction.select_with_account().order_by(desc(Transaction.date)).limit(100)
+            )
+            return jsonify([Transaction.dict_from_row(row) for row in rows])
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -419,7 +423,7 @@ def register_routes(app):
     def api_get_accounts():
         """API endpoint to get accounts"""
         try:
-            accounts = Account.query.filter_by(is_active=True).all()
+            accounts = Account.query.options(db.undefer(Account.transaction_count)).filter_by(is_active=True).all()
             return jsonify([a.to_dict() for a in accounts])
         except Exception as e:
             return jsonify({"error": str(e)}), 500
@@ -448,7 +452,7 @@ def register_routes(app):
         try:
             # Get expense categories (excluding income)
             category_data = (
-                db.session.query(Transaction.category, func.sum(Transaction.amount).label("total"))
+                db.session.query(Transaction.category, (func.sum(Transaction.amount_cents) / 100.0).label("total"))
                 .filter(Transaction.is_debit.is_(True), Transaction.category != "Income")
                 .group_by(Transaction.category)
                 .all()
@@ -477,7 +481,7 @@ def register_routes(app):
         try:
             # Get expense categories (excluding income)
             category_data = (
-                db.session.query(Transaction.category, func.sum(Transaction.amount).label("total"))
+                db.session.query(Transaction.category, (func.sum(Transaction.amount_cents) / 100.0).label("total"))
                 .filter(Transaction.is_debit.is_(True), Transaction.category != "Income")
                 .group_by(Transaction.category)
                 .all()
@@ -491,8 +495,10 @@ def register_routes(app):
     def api_monthly_trends():
         """API endpoint for monthly income/expense trend (original format)"""
         try:
-            # Get all transactions and process in Python
-            transactions = Transaction.query.all()
+            # Get all transactions and process in Python, loading only the columns used
+            transactions = Transaction.query.options(
+                db.load_only(Transaction.date, Transaction.is_debit, Transaction.amount_cents)
+            ).all()
 
             # Group by month
             monthly_data = {}
@@ -541,8 +547,10 @@ def register_routes(app):
     def api_monthly_trend():
         """API endpoint for monthly income/expense trend"""
         try:
-            # Get all transactions and process in Python
-            transactions = Transaction.query.all()
+            # Get all transactions and process in Python, loading only the columns used
+            transactions = Transaction.query.options(
+                db.load_only(Transaction.date, Transaction.is_debit, Transaction.amount_cents)
+            ).all()
 
             # Group by month
             monthly_data = {}
@@ -576,8 +584,15 @@ def register_routes(app):
     def api_account_distribution():
         """API endpoint for account distribution chart"""
         try:
-            # Get all transactions and process in Python
-            transactions = Transaction.query.join(Account).all()
+            # Get all transactions and process in Python, loading only the columns used
+            transactions = (
+                Transaction.query.join(Account)
+                .options(
+                    db.load_only(Transaction.is_debit, Transaction.amount_cents),
+                    db.contains_eager(Transaction.account).load_only(Account.name),
+                )
+                .all()
+            )
 
             # Group by account
             account_data = {}
@@ -813,15 +828,19 @@ def register_routes(app):
             if not transactions_data:
                 return jsonify({"error": "No transactions to save"}), 400
 
-            saved_transactions = []
+            transaction_rows = []
+            accounts = {}
 
             for trans_data in transactions_data:
-                # Get or create account
+                # Get or create account, once per account in the upload
                 bank = trans_data.get("bank", "HDFC")
                 account_type = trans_data.get("account_type", "Savings Account")
-                account = AccountService.get_or_create_account(
-                    name=trans_data.get("account_name", f"{bank} {account_type}"), bank=bank, account_type=account_type
-                )
+                account_name = trans_data.get("account_name", f"{bank} {account_type}")
+                if (account_name, bank) not in accounts:
+                    accounts[(account_name, bank)] = AccountService.get_or_create_account(
+                        name=account_name, bank=bank, account_type=account_type
+                    )
+                account = accounts[(account_name, bank)]
 
                 # Create transaction
                 # Handle multiple date formats
@@ -833,29 +852,22 @@ def register_routes(app):
                     # Handle YYYY-MM-DD format
                     transaction_date = datetime.strptime(date_str, "%Y-%m-%d").date()
 
-                transaction = Transaction(
-                    date=transaction_date,
-                    description=trans_data["description"],
-                    amount=float(trans_data["amount"]),
-                    category=trans_data.get("category", "Other"),
-                    subcategory=trans_data.get("subcategory"),
-                    account_id=account.id,
-                    is_debit=float(trans_data["amount"]) < 0,
-                    transaction_type="pdf_parsed",
-                    notes=trans_data.get("notes"),
-                )
-
-                # Set tags - combine categories and account types
-                tags = {"categories": [trans_data.get("category", "Other")], "account_type": [account_type]}
-                transaction.set_tags(tags)
-
-                # Also set legacy fields for backward compatibility
-                transaction.category = trans_data.get("category", "Other")
-                transaction.bank = bank
-
-                db.session.add(transaction)
-                saved_transactions.append(transaction)
-
+                transaction_rows.append({
+                    "date": transaction_date,
+                    "description": trans_data["description"],
+                    "amount": float(trans_data["amount"]),
+                    "category": trans_data.get("category", "Other"),
+                    "subcategory": trans_data.get("subcategory"),
+                    "account_id": account.id,
+                    "is_debit": float(trans_data["amount"]) < 0,
+                    "transaction_type": "pdf_parsed",
+                    "notes": trans_data.get("notes"),
+                    # Tags - combine categories and account types
+                    "tags": {"categories": [trans_data.get("category", "Other")], "account_type": [account_type]},
+                })
+
+            # One multi-row INSERT; rows already in the database are skipped
+            saved_count = Transaction.bulk_ingest(transaction_rows)
             db.session.commit()
 
             # Clear pending transactions from session
@@ -864,8 +876,9 @@ def register_routes(app):
             return jsonify(
                 {
                     "success": True,
-                    "message": f"Successfully saved {len(saved_transactions)} transactions",
-                    "transaction_count": len(saved_transactions),
+                    "message": f"Successfully saved {saved_count} transactions",
+                    "transaction_count": saved_count,
+                    "duplicate_count": len(transaction_rows) - saved_count,
                 }
             )
 
@@ -1203,7 +1216,7 @@ def register_routes(app):
                 date_to=datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else None,
             )
 
-            return jsonify([t.to_dict() for t in transactions])
+            return jsonify(Transaction.bulk_to_dicts(transactions))
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
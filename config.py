@@ -12,6 +12,8 @@ class Config:
     # Feature Flags
     ENABLE_FILE_UPLOAD = os.environ.get("ENABLE_FILE_UPLOAD", "false").lower() in ("true", "1", "yes", "on")
     ENABLE_LLM_PARSING = os.environ.get("ENABLE_LLM_PARSING", "true").lower() in ("true", "1", "yes", "on")
+    # Also fill the hashed IP/user agent and duplicated legacy audit_logs columns on every audit write
+    WRITE_LEGACY_AUDIT_FIELDS = os.environ.get("WRITE_LEGACY_AUDIT_FIELDS", "false").lower() in ("true", "1", "yes", "on")
 
     # Upload configuration
     UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER") or "uploads/"
@@ -73,10 +75,17 @@ class ProductionConfig(Config):
         os.environ.get("DATABASE_URL") or f"postgresql://{DB_USER}:{quote_plus(DB_PASSWORD)}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     )
 
+    # Recording inspects the call stack on every query; nothing reads the records in production
+    SQLALCHEMY_RECORD_QUERIES = False
+
     # SSL mode for production
     SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_recycle": 300,
+        # pool_pre_ping already replaces dead connections, so recycling only needs to
+        # outlive server-side idle limits; each recycle costs a fresh TLS connect
+        "pool_recycle": 1800,
         "pool_pre_ping": True,
+        # Reuse the most recently returned connection so spare ones can go idle
+        "pool_use_lifo": True,
     }
 
     # Production-specific settings
@@ -0,0 +1,88 @@
+"""
+Bank Parsers Module
+Regex line parsers for statement layouts that are fixed enough to skip the LLM entirely.
+"""
+
+import re
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# HDFC Credit Card: 01/03/2025 [12:34:56] AMAZON PAY INDIA 1,299.00 [Cr] - debits carry no marker.
+# A description ending in an amount means a second amount column, which this layout doesn't have
+HDFC_CARD_ROW = re.compile(
+    r'^(?P<date>\d{2}/\d{2}/\d{4})(?:\s+\d{2}:\d{2}:\d{2})?\s+(?P<desc>.+?)(?<!\d\.\d{2})\s+(?P<amt>[\d,]+\.\d{2})'
+    r'(?:\s+(?P<type>Cr))?\s*$',
+    re.IGNORECASE
+)
+
+# Federal Bank statements print withdrawal, deposit and balance columns that a single-line
+# pattern can't tell apart, so they stay on the LLM path (see parsers/federal_bank_parser.py)
+
+# Any line starting with a date is treated as a transaction row
+_ROW_START = re.compile(r'^\d{2}[/-]\d{2}[/-]\d{2,4}\b')
+
+
+def _parse_rows(pdf_text: str, row_pattern: re.Pattern) -> List[Dict]:
+    """
+    Parse every date-led line of a statement with a single row pattern.
+
+    Args:
+        pdf_text: Raw text extracted from the statement PDF
+        row_pattern: Compiled pattern with date, desc, amt and type groups
+
+    Returns:
+        List of transaction dictionaries, or an empty list if any row doesn't match the layout
+    """
+    transactions = []
+    for line in pdf_text.splitlines():
+        line = line.strip()
+        if not _ROW_START.match(line):
+            continue
+
+        match = row_pattern.match(line)
+        if match is None:
+            # Unknown layout - let the LLM handle the whole statement rather than drop rows
+            return []
+
+        try:
+            date = datetime.strptime(match.group('date'), '%d/%m/%Y').strftime('%Y-%m-%d')
+        except ValueError:
+            return []
+
+        marker = (match.group('type') or '').lower()
+        transactions.append({
+            'date': date,
+            'description': ' '.join(match.group('desc').split()),
+            'amount': float(match.group('amt').replace(',', '')),
+            'type': 'credit' if marker == 'cr' else 'debit'
+        })
+
+    return transactions
+
+
+def parse_hdfc_credit_card(pdf_text: str) -> List[Dict]:
+    """Parse an HDFC credit card statement, where only credits are marked."""
+    return _parse_rows(pdf_text, HDFC_CARD_ROW)
+
+
+_BANK_PARSERS: Dict[str, Callable[[str], List[Dict]]] = {
+    'hdfc credit card': parse_hdfc_credit_card,
+}
+
+
+def parse_known_format(pdf_text: str, bank_name: str) -> Optional[List[Dict]]:
+    """
+    Parse a statement without the LLM when the bank's layout is known.
+
+    Args:
+        pdf_text: Raw text extracted from the statement PDF
+        bank_name: Name of the bank (e.g., "HDFC Credit Card")
+
+    Returns:
+        List of transaction dictionaries, or None if the bank has no fast parser
+        or the text didn't match its layout
+    """
+    parser = _BANK_PARSERS.get(bank_name.lower().strip())
+    if parser is None:
+        return None
+    return parser(pdf_text) or None
@@ -3,14 +3,330 @@ LLM Service for bank statement parsing, transaction categorization, and chat fun
 """
 
 import logging
+from collections import defaultdict
+from operator import itemgetter
 import requests
 import json
+import random
 import time
-from typing import List, Dict, Optional
+from typing import Any, Iterator, List, Dict, Optional, Union
 import os
-from requests.exceptions import RequestException, Timeout, ConnectionError
+from requests.exceptions import RequestException, Timeout, ConnectionError, HTTPError
 import re
 from config import Config
+from llm_services.bank_parsers import parse_known_format
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+# Composite identity of a parsed transaction, used to drop rows repeated across chunks
+_DEDUP_KEY = itemgetter('date', 'description', 'amount')
+_DATE_KEY = itemgetter('date')
+
+# Dates and long digit runs (reference numbers, card suffixes) that make otherwise
+# identical merchant descriptions look distinct
+_DESCRIPTION_NOISE = re.compile(r'\b\d{2}[/-]\d{2}[/-]\d{2,4}\b|\b\d{2,}\b')
+
+
+def _raw_decode_first(text: str, opener: str):
+    """
+    Decode the first well-formed JSON value that starts at an ``opener`` character.
+    
+    Args:
+        text: Text that may contain JSON mixed with prose
+        opener: Either '[' or '{'
+        
+    Returns:
+        Decoded JSON value, or None if no candidate position decodes
+    """
+    idx = text.find(opener)
+    while idx != -1:
+        try:
+            return _JSON_DECODER.raw_decode(text, idx)[0]
+        except json.JSONDecodeError:
+            idx = text.find(opener, idx + 1)
+    return None
+
+
+# Context window for every call. Ollama reloads the model runner whenever num_ctx changes, so
+# it is fixed rather than sized per prompt. It fits the largest chunk (8000 chars, ~4000 tokens
+# for digit-heavy statement text) plus the prompt template and the full 2048-token output budget
+_NUM_CTX = 8192
+
+
+def _dumps_json(value) -> bytes:
+    """Serialize to UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+def _loads_json(data):
+    """Parse JSON text or bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+_CURRENCY_SYMBOLS = '₹$€£¥'
+_JSON_WHITESPACE = ' \t\r\n'
+
+# Characters that end a plain run inside a JSON string: the closing quote, escapes and control chars
+_STRING_SPECIAL = re.compile(r'["\\\x00-\x1f\x7f-\x9f]')
+
+
+def _is_control_char(ch: str) -> bool:
+    return ch < ' ' or '\x7f' <= ch <= '\x9f'
+
+
+def _is_digit(ch: str) -> bool:
+    return '0' <= ch <= '9'
+
+
+def _skip_whitespace(text: str, i: int) -> int:
+    n = len(text)
+    while i < n and text[i] in _JSON_WHITESPACE:
+        i += 1
+    return i
+
+
+def _scan_amount_value(text: str, i: int):
+    """
+    Parse the value following an "amount" key, tolerating quotes, currency symbols,
+    thousands separators and a detached minus sign.
+    
+    Args:
+        text: Text being sanitized
+        i: Index just past the closing quote of the "amount" key
+        
+    Returns:
+        Tuple of (normalized number text, index after the value), or None if the
+        value isn't a recognizable number
+    """
+    n = len(text)
+    k = _skip_whitespace(text, i)
+    if k >= n or text[k] != ':':
+        return None
+    k = _skip_whitespace(text, k + 1)
+    quoted = k < n and text[k] == '"'
+    if quoted:
+        k += 1
+    if k < n and text[k] in _CURRENCY_SYMBOLS:
+        k = _skip_whitespace(text, k + 1)
+    sign = ''
+    if k < n and text[k] in '+-':
+        sign = '-' if text[k] == '-' else ''
+        k = _skip_whitespace(text, k + 1)
+    start = k
+    while k < n:
+        ch = text[k]
+        if _is_digit(ch) or ch == '.':
+            k += 1
+        elif ch == ',' and k + 1 < n and _is_digit(text[k + 1]):
+            k += 1
+        else:
+            break
+    if k == start or not _is_digit(text[start]):
+        return None
+    number = sign + text[start:k].replace(',', '')
+    if quoted:
+        if k >= n or text[k] != '"':
+            # Quoted value with trailing text ("12.00 INR") - leave it as a string
+            return None
+        k += 1
+    return number, k
+
+
+def _sanitize_json_text(text: str) -> str:
+    """
+    Repair common LLM JSON formatting problems in a single pass over the text.
+    
+    Handles markdown fences, control characters and runs of whitespace inside strings,
+    single-quoted strings, trailing commas, thousands separators, quoted or currency-prefixed
+    amounts, and arrays truncated mid-object.
+    
+    Args:
+        text: Raw JSON-ish text from the LLM
+        
+    Returns:
+        Sanitized JSON string
+    """
+    text = text.strip()
+    if text.startswith('```json'):
+        text = text[7:].lstrip()
+    elif text.startswith('```'):
+        text = text[3:].lstrip()
+    if text.endswith('```'):
+        text = text[:-3].rstrip()
+    
+    out = []
+    append = out.append
+    n = len(text)
+    i = 0
+    open_brackets = close_brackets = 0
+    last_object_end = -1  # Length of out just after the most recent '}'
+    
+    while i < n:
+        c = text[i]
+        
+        if c == '"':
+            # Copy the string, turning control characters into spaces and collapsing whitespace.
+            # Plain runs are located with a regex search so the scan stays in C.
+            j = i + 1
+            chars = []
+            while True:
+                match = _STRING_SPECIAL.search(text, j)
+                if match is None:
+                    chars.append(text[j:])
+                    j = n
+                    break
+                k = match.start()
+                chars.append(text[j:k])
+                ch = text[k]
+                if ch == '"':
+                    j = k
+                    break
+                if ch == '\\':
+                    chars.append(text[k:k + 2])
+                    j = k + 2
+                else:
+                    chars.append(' ')
+                    j = k + 1
+            content = ' '.join(''.join(chars).split())
+            append(f'"{content}"')
+            i = j + 1
+            if content == 'amount':
+                amount = _scan_amount_value(text, i)
+                if amount is not None:
+                    append(': ' + amount[0])
+                    i = amount[1]
+            continue
+        
+        if c == "'":
+            # Single-quoted string used as a key or value
+            k = text.find("'", i + 1)
+            if k != -1:
+                nxt = _skip_whitespace(text, k + 1)
+                if nxt < n and text[nxt] in ',:]}':
+                    append('"' + text[i + 1:k] + '"')
+                    i = k + 1
+                    continue
+            append(c)
+            i += 1
+            continue
+        
+        if c == ',':
+            nxt = _skip_whitespace(text, i + 1)
+            if nxt < n and text[nxt] in '}]':
+                # Trailing comma before a closing bracket/brace
+                i += 1
+                continue
+            if (out and _is_digit(out[-1][-1]) and i + 3 < n and _is_digit(text[i + 1])
+                    and _is_digit(text[i + 2]) and _is_digit(text[i + 3])
+                    and (i + 4 >= n or not _is_digit(text[i + 4]))):
+                # Thousands separator inside a bare number (78,791.65)
+                i += 1
+                continue
+            append(c)
+            i += 1
+            continue
+        
+        if _is_control_char(c):
+            i += 1
+            continue
+        
+        if c == '[':
+            open_brackets += 1
+        elif c == ']':
+            close_brackets += 1
+        append(c)
+        if c == '}':
+            last_object_end = len(out)
+        i += 1
+    
+    # Close an array that was cut off after its last complete object
+    if open_brackets > close_brackets and last_object_end != -1:
+        del out[last_object_end:]
+        append(']')
+    
+    return ''.join(out)
+
+
+# Categories the LLM may assign to a transaction
+_CATEGORIES = (
+    "Food & Dining", "Transportation", "Shopping", "Entertainment",
+    "Bills & Utilities", "Healthcare", "Education", "Travel",
+    "Investment", "Transfer", "Income", "Other"
+)
+
+# Ollama structured-output schemas (requires Ollama 0.5+, older servers ignore them)
+_TRANSACTIONS_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "date": {"type": "string"},
+            "description": {"type": "string"},
+            "amount": {"type": "number"},
+            "type": {"type": "string", "enum": ["credit", "debit"]}
+        },
+        "required": ["date", "description", "amount", "type"]
+    }
+}
+_CATEGORY_SCHEMA = {"type": "string", "enum": list(_CATEGORIES)}
+
+
+# Fixed part of the statement parsing prompt, only the bank name and text vary per chunk
+_PARSE_PROMPT_TEMPLATE = """Extract transactions from this {bank_name} bank statement.
+
+CRITICAL: Return ONLY a JSON array of transaction objects. Do NOT return any other format.
+
+REQUIRED FORMAT (copy this exactly):
+[
+  {{"date": "2025-03-01", "description": "ATM withdrawal", "amount": 2000.50, "type": "debit"}},
+  {{"date": "2025-03-02", "description": "Salary credit", "amount": 50000.00, "type": "credit"}}
+]
+
+RULES:
+- Each transaction must be a separate object in the array
+- Use "credit" for money IN, "debit" for money OUT  
+- Amount must be positive number (no minus signs)
+- Date format: YYYY-MM-DD
+- Description: clean text without symbols
+- Return ONLY the JSON array, no other text or explanations
+
+Bank statement text:
+{chunk_text}
+
+JSON array:"""
+
+
+def _iter_chunks(text: str, max_chunk_size: int) -> Iterator[str]:
+    """
+    Split text into chunks of at most max_chunk_size characters, ending each on a line break.
+    
+    A chunk is only cut mid-line when the nearest newline is in its first half.
+    """
+    n = len(text)
+    start = 0
+    while start < n:
+        end = min(start + max_chunk_size, n)
+        if end < n:
+            line_break = text.rfind('\n', start, end)
+            if line_break > start + max_chunk_size // 2:
+                end = line_break + 1
+        yield text[start:end]
+        start = end
+
+
+def _normalize_description(description: str) -> str:
+    """Reduce a transaction description to a merchant key for categorization grouping."""
+    return ' '.join(_DESCRIPTION_NOISE.sub(' ', description.lower()).split())
 
 
 class LLMServiceError(Exception):
@@ -38,6 +354,9 @@ class LLMService:
         self.default_timeout = default_timeout
         self.categorization_timeout = 30  # Longer timeout for categorization
         self.max_retries = 3  # Maximum number of retries
+        self.max_backoff = 30  # Upper bound in seconds for a single retry delay
+        self.failure_cooldown = 30  # Seconds to fail fast after all retries are exhausted
+        self._cooldown_until = 0.0  # time.monotonic() deadline of the active cooldown window
         
         # Set up logging
         self.logger = logging.getLogger(__name__)
@@ -60,13 +379,19 @@ class LLMService:
         Raises:
             LLMServiceError: If LLM parsing fails
         """
+        # Known fixed layouts are parsed with a regex and never reach the LLM
+        transactions = parse_known_format(pdf_text, bank_name)
+        if transactions:
+            self.logger.info(f"Parsed {len(transactions)} transactions from {bank_name} statement without the LLM")
+            return transactions
+        
         # Use full PDF text, not just first 5000 characters
         # Split into chunks if too large to handle token limits
         max_chunk_size = 8000  # Smaller chunk size for better processing with llama3.2:1b
         
         if len(pdf_text) > max_chunk_size:
-            # Process in chunks and combine results
-            chunks = [pdf_text[i:i+max_chunk_size] for i in range(0, len(pdf_text), max_chunk_size)]
+            # Process in chunks and combine results, splitting on line breaks so rows stay whole
+            chunks = list(_iter_chunks(pdf_text, max_chunk_size))
             all_transactions = []
             
             for i, chunk in enumerate(chunks):
@@ -92,67 +417,11 @@ class LLMService:
             Sanitized JSON string
         """
         try:
-            # Remove any leading/trailing whitespace
-            json_str = json_str.strip()
-            
-            # Remove markdown code block markers if present
-            json_str = re.sub(r'^```json\s*', '', json_str)
-            json_str = re.sub(r'^```\s*', '', json_str)
-            json_str = re.sub(r'\s*```$', '', json_str)
-            
-            # Fix control characters within strings - replace newlines with spaces
-            # This regex finds quoted strings and replaces control characters within them
-            def fix_string_content(match):
-                content = match.group(1)
-                # Replace control characters with spaces
-                content = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', content)
-                # Replace multiple spaces with single space
-                content = re.sub(r'\s+', ' ', content)
-                return f'"{content.strip()}"'
-            
-            # Apply the fix to quoted strings
-            json_str = re.sub(r'"([^"]*)"', fix_string_content, json_str)
-            
-            # Fix common JSON issues
-            # Replace single quotes with double quotes (but be careful with apostrophes in text)
-            json_str = re.sub(r"(?<!\\)'([^']*)'(?=\s*[,:\]}])", r'"\1"', json_str)
-            
-            # Remove trailing commas before closing brackets/braces
-            json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-            
-            # Fix number formatting - handle all currency and comma issues
-            # Remove currency symbols and quotes around numbers
-            json_str = re.sub(r'"amount":\s*"?[₹$€£¥]?\s*([+-]?\d+(?:,\d{3})*(?:\.\d+)?)"?', r'"amount": \1', json_str)
-            
-            # Remove commas from numbers (e.g., 78,791.65 -> 78791.65)
-            def fix_number_commas(match):
-                number = match.group(1).replace(',', '')
-                return f'"amount": {number}'
-            json_str = re.sub(r'"amount":\s*([+-]?\d+(?:,\d{3})*(?:\.\d+)?)', fix_number_commas, json_str)
-            
-            # Handle malformed numbers with commas in JSON (specific case from error)
-            json_str = re.sub(r'(\d+),(\d+)\.(\d+)', r'\1\2.\3', json_str)  # 78,791.65 -> 78791.65
-            json_str = re.sub(r'(\d+),(\d+)(?!\d)', r'\1\2', json_str)      # 78,791 -> 78791
-            
-            # Fix minus signs that appear as separate tokens
-            json_str = re.sub(r'"amount":\s*-\s*(\d+)', r'"amount": -\1', json_str)
-            
-            # Handle incomplete JSON - if it's cut off, try to close it properly
-            if json_str.count('[') > json_str.count(']'):
-                # Try to find the last complete transaction and close the array
-                last_complete = json_str.rfind('}')
-                if last_complete != -1:
-                    json_str = json_str[:last_complete + 1] + ']'
-            
-            # Final cleanup - remove any remaining control characters
-            json_str = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', json_str)
-            
-            return json_str
-            
+            return _sanitize_json_text(json_str)
         except Exception as e:
             self.logger.warning(f"JSON sanitization failed: {e}")
             return json_str
-
+    
     def _extract_json_array(self, response: str) -> str:
         """
         Extract JSON array from LLM response, handling various formats.
@@ -184,59 +453,27 @@ class LLMService:
             
             response = '\n'.join(lines[start_line:end_line]).strip()
         
-        # Try to find the first complete JSON array
-        start_idx = response.find('[')
-        if start_idx != -1:
-            # Count brackets to find the matching closing bracket
-            bracket_count = 0
-            end_idx = -1
-            
-            for i in range(start_idx, len(response)):
-                if response[i] == '[':
-                    bracket_count += 1
-                elif response[i] == ']':
-                    bracket_count -= 1
-                    if bracket_count == 0:
-                        end_idx = i + 1
-                        break
-            
-            if end_idx != -1:
-                json_array = response[start_idx:end_idx]
-                return json_array
+        # Decode the first complete JSON array directly; raw_decode scans in C
+        array = _raw_decode_first(response, '[')
+        if array is None and '[' in response:
+            # The array may be truncated or carry trailing commas - repair and retry
+            array = _raw_decode_first(self._sanitize_json_string(response[response.find('['):]), '[')
+        if isinstance(array, list):
+            return json.dumps(array)
         
         # Try to find JSON object and extract array from it
-        obj_start = response.find('{')
-        if obj_start != -1:
-            # Count braces to find the matching closing brace
-            brace_count = 0
-            obj_end = -1
-            
-            for i in range(obj_start, len(response)):
-                if response[i] == '{':
-                    brace_count += 1
-                elif response[i] == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        obj_end = i + 1
-                        break
+        obj = _raw_decode_first(response, '{')
+        if obj is None and '{' in response:
+            obj = _raw_decode_first(self._sanitize_json_string(response[response.find('{'):]), '{')
+        if isinstance(obj, dict):
+            # Look for array in common keys
+            for key in ['transactions', 'data', 'results', 'items']:
+                if key in obj and isinstance(obj[key], list):
+                    return json.dumps(obj[key])
             
-            if obj_end != -1:
-                try:
-                    obj_str = response[obj_start:obj_end]
-                    obj_str = self._sanitize_json_string(obj_str)
-                    obj = json.loads(obj_str)
-                    
-                    # Look for array in common keys
-                    for key in ['transactions', 'data', 'results', 'items']:
-                        if key in obj and isinstance(obj[key], list):
-                            return json.dumps(obj[key])
-                    
-                    # If the object itself looks like a transaction, wrap it in an array
-                    if all(k in obj for k in ['date', 'description', 'amount', 'type']):
-                        return json.dumps([obj])
-                        
-                except json.JSONDecodeError:
-                    pass
+            # If the object itself looks like a transaction, wrap it in an array
+            if all(k in obj for k in ['date', 'description', 'amount', 'type']):
+                return json.dumps([obj])
         
         # Last resort: try to extract multiple JSON objects and create an array
         import re
@@ -275,86 +512,25 @@ class LLMService:
         Raises:
             LLMServiceError: If parsing fails
         """
-        import json
-        import re
-        prompt = f"""Extract transactions from this {bank_name} bank statement.
-
-CRITICAL: Return ONLY a JSON array of transaction objects. Do NOT return any other format.
-
-REQUIRED FORMAT (copy this exactly):
-[
-  {{"date": "2025-03-01", "description": "ATM withdrawal", "amount": 2000.50, "type": "debit"}},
-  {{"date": "2025-03-02", "description": "Salary credit", "amount": 50000.00, "type": "credit"}}
-]
-
-RULES:
-- Each transaction must be a separate object in the array
-- Use "credit" for money IN, "debit" for money OUT  
-- Amount must be positive number (no minus signs)
-- Date format: YYYY-MM-DD
-- Description: clean text without symbols
-- Return ONLY the JSON array, no other text or explanations
-
-Bank statement text:
-{chunk_text}
-
-JSON array:"""
+        prompt = _PARSE_PROMPT_TEMPLATE.format(bank_name=bank_name, chunk_text=chunk_text)
         
         try:
-            response = self._call_llm_with_retry(prompt, timeout=self.default_timeout)
+            # Budget output by chunk size instead of always reserving the full 2048 tokens
+            max_output = min(2048, max(256, len(chunk_text) // 2))
+            response = self._call_llm_with_retry(prompt, timeout=self.default_timeout, stop_on_json_array=True,
+                                                 max_output=max_output, response_format=_TRANSACTIONS_SCHEMA)
             
             # Clean the response - remove any non-JSON content
             response = response.strip()
             self.logger.debug(f"Raw LLM response: {response[:200]}...")
             
-            # Extract JSON array from response
-            json_str = self._extract_json_array(response)
-            
-            # Sanitize the JSON string
-            json_str = self._sanitize_json_string(json_str)
-            self.logger.debug(f"Sanitized JSON: {json_str[:200]}...")
-            
-            # Try to parse JSON
+            # Constrained decoding normally yields a clean array, skip the repair passes
             try:
-                transactions = json.loads(json_str)
-            except json.JSONDecodeError as e:
-                # If parsing fails, try to fix common issues and parse again
-                self.logger.warning(f"Initial JSON parse failed: {e}")
-                self.logger.warning(f"Attempting more aggressive JSON cleaning...")
-                
-                # Handle "Extra data" error - truncate at first complete JSON array/object
-                if "Extra data" in str(e):
-                    # Try to extract just the first valid JSON structure
-                    try:
-                        # Find the first complete JSON array or object
-                        decoder = json.decoder.JSONDecoder()
-                        transactions, idx = decoder.raw_decode(json_str)
-                        self.logger.info(f"Successfully extracted JSON from position 0 to {idx}")
-                    except json.JSONDecodeError:
-                        # Fall back to more aggressive cleaning
-                        json_str = self._extract_json_array(json_str)
-                        try:
-                            transactions = json.loads(json_str)
-                        except json.JSONDecodeError:
-                            transactions = self._extract_transactions_from_malformed_json(json_str)
-                else:
-                    # Try more aggressive cleaning for other JSON errors
-                    json_str = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', json_str)  # Remove control characters
-                    json_str = re.sub(r'[^\x20-\x7E\u00A0-\uFFFF]', '', json_str)  # Keep only printable chars
-                    
-                    # Handle truncated JSON by finding the last complete object
-                    if json_str.count('{') > json_str.count('}'):
-                        last_brace = json_str.rfind('}')
-                        if last_brace != -1:
-                            json_str = json_str[:last_brace + 1] + ']'
-                    
-                    # Try parsing again
-                    try:
-                        transactions = json.loads(json_str)
-                    except json.JSONDecodeError:
-                        # Last resort: try to extract individual transaction objects
-                        self.logger.warning("Attempting to extract individual transaction objects...")
-                        transactions = self._extract_transactions_from_malformed_json(json_str)
+                transactions = json.loads(response)
+            except json.JSONDecodeError:
+                transactions = None
+            if not isinstance(transactions, list):
+                transactions = self._repair_json_response(response)
             
             if not isinstance(transactions, list):
                 raise ValueError("Response is not a list")
@@ -413,7 +589,6 @@ JSON array:"""
         except json.JSONDecodeError as e:
             self.logger.error(f"Failed to parse LLM response as JSON: {e}")
             self.logger.error(f"Raw response: {response[:500]}...")
-            self.logger.error(f"Sanitized JSON: {json_str[:500]}...")
             raise LLMServiceError(f"LLM returned invalid JSON: {e}")
         except ValueError as e:
             self.logger.error(f"Invalid transaction data: {e}")
@@ -422,6 +597,69 @@ JSON array:"""
             self.logger.error(f"Bank statement parsing failed: {e}")
             raise LLMServiceError(f"Bank statement parsing failed: {e}")
 
+    def _repair_json_response(self, response: str) -> Any:
+        """
+        Recover transactions from a response that isn't a clean JSON array.
+        
+        Only needed when the LLM server ignores the structured-output schema.
+        
+        Args:
+            response: Raw LLM response text
+            
+        Returns:
+            Parsed JSON value (normally a list of transaction dictionaries)
+        """
+        # Extract JSON array from response
+        json_str = self._extract_json_array(response)
+        
+        # Sanitize the JSON string
+        json_str = self._sanitize_json_string(json_str)
+        self.logger.debug(f"Sanitized JSON: {json_str[:200]}...")
+        
+        # Try to parse JSON
+        try:
+            transactions = json.loads(json_str)
+        except json.JSONDecodeError as e:
+            # If parsing fails, try to fix common issues and parse again
+            self.logger.warning(f"Initial JSON parse failed: {e}")
+            self.logger.warning(f"Attempting more aggressive JSON cleaning...")
+            
+            # Handle "Extra data" error - truncate at first complete JSON array/object
+            if "Extra data" in str(e):
+                # Try to extract just the first valid JSON structure
+                try:
+                    # Find the first complete JSON array or object
+                    decoder = json.decoder.JSONDecoder()
+                    transactions, idx = decoder.raw_decode(json_str)
+                    self.logger.info(f"Successfully extracted JSON from position 0 to {idx}")
+                except json.JSONDecodeError:
+                    # Fall back to more aggressive cleaning
+                    json_str = self._extract_json_array(json_str)
+                    try:
+                        transactions = json.loads(json_str)
+                    except json.JSONDecodeError:
+                        transactions = self._extract_transactions_from_malformed_json(json_str)
+            else:
+                # Try more aggressive cleaning for other JSON errors
+                json_str = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', json_str)  # Remove control characters
+                json_str = re.sub(r'[^\x20-\x7E\u00A0-\uFFFF]', '', json_str)  # Keep only printable chars
+                
+                # Handle truncated JSON by finding the last complete object
+                if json_str.count('{') > json_str.count('}'):
+                    last_brace = json_str.rfind('}')
+                    if last_brace != -1:
+                        json_str = json_str[:last_brace + 1] + ']'
+                
+                # Try parsing again
+                try:
+                    transactions = json.loads(json_str)
+                except json.JSONDecodeError:
+                    # Last resort: try to extract individual transaction objects
+                    self.logger.warning("Attempting to extract individual transaction objects...")
+                    transactions = self._extract_transactions_from_malformed_json(json_str)
+        
+        return transactions
+    
     def _extract_transactions_from_malformed_json(self, json_str: str) -> List[Dict]:
         """
         Try to extract transaction data from malformed JSON as a last resort.
@@ -465,21 +703,17 @@ JSON array:"""
     
     def _deduplicate_transactions(self, transactions: List[Dict]) -> List[Dict]:
         """Remove duplicate transactions and sort by date."""
-        seen = set()
-        unique_transactions = []
-        
+        # Keep the first occurrence of each key, in statement order
+        unique_transactions = {}
         for txn in transactions:
-            # Create a unique key based on date, description, and amount
-            key = (txn['date'], txn['description'], txn['amount'])
-            if key not in seen:
-                seen.add(key)
-                unique_transactions.append(txn)
+            unique_transactions.setdefault(_DEDUP_KEY(txn), txn)
+        unique_transactions = list(unique_transactions.values())
         
-        # Sort by date
+        # Stable sort on date alone so same-day rows keep their statement sequence
         try:
-            unique_transactions.sort(key=lambda x: x['date'])
-        except:
-            pass  # If date sorting fails, return unsorted
+            unique_transactions.sort(key=_DATE_KEY)
+        except TypeError:
+            pass  # Mixed date types can't be ordered, keep the input order
         
         return unique_transactions
     
@@ -509,16 +743,17 @@ JSON array:"""
         """
         
         try:
-            category = self._call_llm_with_retry(prompt, timeout=self.categorization_timeout).strip()
+            # A category label is only a few tokens; the schema restricts it to a known category
+            response = self._call_llm_with_retry(prompt, timeout=self.categorization_timeout, max_output=8,
+                                                 response_format=_CATEGORY_SCHEMA).strip()
             
-            # Validate category
-            valid_categories = [
-                "Food & Dining", "Transportation", "Shopping", "Entertainment",
-                "Bills & Utilities", "Healthcare", "Education", "Travel",
-                "Investment", "Transfer", "Income", "Other"
-            ]
+            # Constrained output is a JSON string, servers without schema support return bare text
+            try:
+                category = json.loads(response)
+            except json.JSONDecodeError:
+                category = response
             
-            if category not in valid_categories:
+            if category not in _CATEGORIES:
                 self.logger.warning(f"LLM returned invalid category '{category}', defaulting to 'Other'")
                 category = "Other"
                 
@@ -529,6 +764,40 @@ JSON array:"""
             self.logger.error(f"Transaction categorization failed: {e}")
             raise LLMServiceError(f"Transaction categorization failed: {e}")
     
+    def categorize_transactions(self, transactions: List[Dict]) -> List[Optional[str]]:
+        """
+        Categorize many transactions with one LLM call per distinct merchant.
+        
+        Bank descriptions repeat heavily once reference numbers and dates are removed
+        ("UPI-SWIGGY-412345" / "UPI-SWIGGY-498765"), so transactions are grouped by their
+        normalized description and only one representative of each group is sent to the LLM.
+        
+        Args:
+            transactions: Transaction dictionaries with 'description' and 'amount' keys
+            
+        Returns:
+            Categories in the same order as the input. An entry is None when the LLM
+            failed to categorize that transaction's group.
+        """
+        groups: Dict[str, List[int]] = defaultdict(list)
+        for i, transaction in enumerate(transactions):
+            groups[_normalize_description(str(transaction.get('description', '')))].append(i)
+        
+        results: List[Optional[str]] = [None] * len(transactions)
+        for indices in groups.values():
+            representative = transactions[indices[0]]
+            description = str(representative.get('description', ''))
+            try:
+                category = self.categorize_transaction(description, float(representative.get('amount', 0)))
+            except (LLMServiceError, ValueError, TypeError) as e:
+                self.logger.warning(f"Failed to categorize '{description}' ({len(indices)} transactions): {e}")
+                continue
+            for i in indices:
+                results[i] = category
+        
+        self.logger.info(f"Categorized {len(transactions)} transactions with {len(groups)} LLM calls")
+        return results
+    
     def chat_query(self, user_message: str, transaction_data: List[Dict]) -> str:
         """
         Process a chat query about financial data.
@@ -545,8 +814,14 @@ JSON array:"""
         """
         # Summarize transaction data to avoid token limits
         total_transactions = len(transaction_data)
-        total_credits = sum(t['amount'] for t in transaction_data if t.get('type') == 'credit')
-        total_debits = sum(t['amount'] for t in transaction_data if t.get('type') == 'debit')
+        total_credits = 0.0
+        total_debits = 0.0
+        for t in transaction_data:
+            transaction_type = t.get('type')
+            if transaction_type == 'credit':
+                total_credits += t['amount']
+            elif transaction_type == 'debit':
+                total_debits += t['amount']
         
         # Get recent transactions for context
         recent_transactions = transaction_data[-10:] if transaction_data else []
@@ -576,13 +851,21 @@ JSON array:"""
             self.logger.error(f"Chat query failed: {e}")
             raise LLMServiceError(f"Chat query failed: {e}")
     
-    def _call_llm_with_retry(self, prompt: str, timeout: Optional[int] = None) -> str:
+    def _call_llm_with_retry(self, prompt: str, timeout: Optional[int] = None, stop_on_json_array: bool = False,
+                             max_output: int = 2048, response_format: Optional[Union[str, Dict]] = None) -> str:
         """
         Make HTTP request to LLM API endpoint with retry logic and exponential backoff.
         
+        Timeouts, connection errors and 5xx responses are retried with jittered exponential
+        backoff. Once every attempt has failed the service enters a cooldown window during
+        which calls fail immediately instead of queueing more requests on a struggling endpoint.
+        
         Args:
             prompt: Text prompt to send to LLM
             timeout: Custom timeout in seconds. If None, uses default_timeout
+            stop_on_json_array: Stop reading the stream once a complete JSON array has been generated
+            max_output: Maximum number of tokens the model may generate
+            response_format: Ollama ``format`` value, ``"json"`` or a JSON schema to constrain the output
             
         Returns:
             LLM response text
@@ -590,20 +873,25 @@ JSON array:"""
         Raises:
             LLMServiceError: If LLM API call fails after all retries
         """
+        remaining_cooldown = self._cooldown_until - time.monotonic()
+        if remaining_cooldown > 0:
+            raise LLMServiceError(f"LLM endpoint is cooling down after repeated failures, retry in {remaining_cooldown:.0f}s")
+        
         timeout = timeout or self.default_timeout
         last_exception = None
         
         for attempt in range(self.max_retries + 1):
             try:
                 if attempt > 0:
-                    # Exponential backoff: 2^attempt seconds
-                    backoff_time = 2 ** attempt
-                    self.logger.info(f"Retrying LLM call in {backoff_time} seconds (attempt {attempt + 1}/{self.max_retries + 1})")
+                    # Exponential backoff with jitter so concurrent callers don't retry in lockstep
+                    backoff_time = min(2 ** attempt + random.uniform(0, 1), self.max_backoff)
+                    self.logger.info(f"Retrying LLM call in {backoff_time:.1f} seconds (attempt {attempt + 1}/{self.max_retries + 1})")
                     time.sleep(backoff_time)
                 
-                return self._call_llm(prompt, timeout=timeout)
+                return self._call_llm(prompt, timeout=timeout, stop_on_json_array=stop_on_json_array,
+                                      max_output=max_output, response_format=response_format)
                 
-            except (Timeout, ConnectionError) as e:
+            except (Timeout, ConnectionError, HTTPError) as e:
                 last_exception = e
                 self.logger.warning(f"LLM call attempt {attempt + 1} failed: {e}")
                 
@@ -617,15 +905,27 @@ JSON array:"""
                 raise e
         
         # If we get here, all retries failed
+        self._cooldown_until = time.monotonic() + self.failure_cooldown
         raise LLMServiceError(f"LLM API call failed after {self.max_retries + 1} attempts: {last_exception}")
     
-    def _call_llm(self, prompt: str, timeout: Optional[int] = None) -> str:
+    def _call_llm(self, prompt: str, timeout: Optional[int] = None, stop_on_json_array: bool = False,
+                  max_output: int = 2048, response_format: Optional[Union[str, Dict]] = None) -> str:
         """
         Make HTTP request to LLM API endpoint.
         
+        The response is streamed so that, when ``stop_on_json_array`` is set, the connection can
+        be closed as soon as the first complete JSON array arrives. Closing the socket makes
+        Ollama stop generating instead of running on to ``num_predict`` tokens.
+        
+        ``num_ctx`` is the same for every call so Ollama keeps one model runner loaded; only
+        ``num_predict`` follows the caller's output budget.
+        
         Args:
             prompt: Text prompt to send to LLM
             timeout: Custom timeout in seconds. If None, uses default_timeout
+            stop_on_json_array: Stop reading the stream once a complete JSON array has been generated
+            max_output: Maximum number of tokens the model may generate
+            response_format: Ollama ``format`` value, ``"json"`` or a JSON schema to constrain the output
             
         Returns:
             LLM response text
@@ -638,15 +938,20 @@ JSON array:"""
         payload = {
             "model": self.model,
             "prompt": prompt,
-            "stream": False,
+            "stream": True,
             "options": {
                 "temperature": 0.1,
                 "top_p": 0.9,
-                "num_predict": 2048,  # Limit response length
+                "num_predict": max_output,  # Limit response length
+                "num_ctx": _NUM_CTX,
                 "stop": ["<|end|>", "###", "---"]  # Stop tokens to prevent rambling
             }
         }
         
+        if response_format is not None:
+            # Constrained decoding: the model can only emit JSON matching the format
+            payload["format"] = response_format
+        
         headers = {
             "Content-Type": "application/json"
         }
@@ -654,22 +959,54 @@ JSON array:"""
         try:
             self.logger.debug(f"Calling LLM API at {self.endpoint} with model {self.model}, timeout: {timeout}s")
             
-            response = requests.post(
+            # With stream=True the requests timeout only bounds each read, so cap the whole generation
+            deadline = time.monotonic() + timeout
+            
+            # Serialize the payload ourselves so the multi-KB prompt goes through the fast encoder
+            with requests.post(
                 self.endpoint,
-                json=payload,
+                data=_dumps_json(payload),
                 headers=headers,
-                timeout=timeout
-            )
-            
-            response.raise_for_status()
-            
-            # Parse Ollama API response
-            response_data = response.json()
-            
-            if 'response' not in response_data:
-                raise LLMServiceError("Invalid response format from LLM API")
+                timeout=timeout,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                
+                # Parse the Ollama stream: one JSON object per line, each carrying a text fragment
+                parts = []
+                array_start = -1
+                for line in response.iter_lines():
+                    if time.monotonic() > deadline:
+                        raise Timeout(f"LLM generation exceeded {timeout}s")
+                    if not line:
+                        continue
+                    response_data = _loads_json(line)
+                    
+                    if 'error' in response_data:
+                        raise LLMServiceError(f"LLM API returned an error: {response_data['error']}")
+                    if 'response' not in response_data:
+                        raise LLMServiceError("Invalid response format from LLM API")
+                    
+                    fragment = response_data['response']
+                    parts.append(fragment)
+                    if response_data.get('done'):
+                        break
+                    
+                    # Only attempt a decode when the fragment could have closed an array
+                    if stop_on_json_array and ']' in fragment:
+                        text = ''.join(parts)
+                        if array_start == -1:
+                            array_start = text.find('[')
+                        if array_start != -1:
+                            try:
+                                _, end = _JSON_DECODER.raw_decode(text, array_start)
+                            except json.JSONDecodeError:
+                                continue
+                            self.logger.debug(f"Complete JSON array received after {end} characters, closing stream")
+                            parts = [text[:end]]
+                            break
                 
-            llm_response = response_data['response'].strip()
+            llm_response = ''.join(parts).strip()
             
             if not llm_response:
                 raise LLMServiceError("Empty response from LLM")
@@ -685,6 +1022,15 @@ JSON array:"""
             self.logger.error(f"LLM API call timed out after {timeout}s: {e}")
             raise Timeout(f"LLM API call timed out: {e}")
             
+        except HTTPError as e:
+            status_code = e.response.status_code if e.response is not None else None
+            self.logger.error(f"LLM API returned HTTP {status_code}: {e}")
+            if status_code is not None and status_code >= 500:
+                # Server-side failures are transient; let the retry loop handle them
+                raise
+            # Client errors (unknown model, bad request) won't succeed on retry
+            raise LLMServiceError(f"LLM API rejected the request: {e}")
+            
         except RequestException as e:
             self.logger.error(f"LLM API request failed: {e}")
             raise LLMServiceError(f"LLM API request failed: {e}")
@@ -693,6 +1039,9 @@ JSON array:"""
             self.logger.error(f"Invalid JSON response from LLM API: {e}")
             raise LLMServiceError(f"Invalid JSON response from LLM API: {e}")
             
+        except LLMServiceError:
+            raise
+            
         except Exception as e:
             self.logger.error(f"Unexpected error in LLM API call: {e}")
             raise LLMServiceError(f"Unexpected error in LLM API call: {e}") 
\ No newline at end of file
@@ -92,16 +92,37 @@ def run_migrations_online():
 
     connectable = get_engine()
 
+    # commit each revision on its own so a late failure doesn't undo earlier ones
+    configure_args = {
+        'transaction_per_migration': True,
+        **current_app.extensions['migrate'].configure_args
+    }
+
     with connectable.connect() as connection:
+        # migrations commit often (per revision, per concurrent index build and per
+        # backfill batch), so don't wait for a WAL flush on every commit; a crash can
+        # lose the last few commits but never leaves a half-applied transaction
+        async_commit = connection.dialect.name == 'postgresql'
+        if async_commit:
+            connection.exec_driver_sql("SET synchronous_commit TO OFF")
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
-            **current_app.extensions['migrate'].configure_args
+            **configure_args
         )
 
-        with context.begin_transaction():
-            context.run_migrations()
+        try:
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if async_commit:
+                # the connection goes back to the app's pool
+                connection.rollback()
+                connection.exec_driver_sql("RESET synchronous_commit")
+                connection.commit()
 
 
 if context.is_offline_mode():
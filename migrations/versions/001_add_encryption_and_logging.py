@@ -5,6 +5,8 @@ Revises:
 Create Date: 2024-12-19 12:00:00.000000
 
 """
+import sqlite3
+
 from alembic import op
 import sqlalchemy as sa
 from sqlalchemy.dialects import sqlite
@@ -113,9 +115,13 @@ def downgrade():
     op.drop_table('chat_sessions')
     
     # Remove encryption columns from transactions table
-    # Note: SQLite doesn't support DROP COLUMN directly, so we need to recreate the table
-    with op.batch_alter_table('transactions', schema=None) as batch_op:
-        batch_op.drop_column('is_encrypted')
-        batch_op.drop_column('encryption_key_id')
-        batch_op.drop_column('encrypted_amount')
-        batch_op.drop_column('encrypted_description') 
\ No newline at end of file
+    encryption_columns = ['is_encrypted', 'encryption_key_id', 'encrypted_amount', 'encrypted_description']
+    if op.get_context().dialect.name == 'sqlite' and sqlite3.sqlite_version_info < (3, 35, 0):
+        # Older SQLite doesn't support DROP COLUMN directly, so we need to recreate the table
+        with op.batch_alter_table('transactions', schema=None) as batch_op:
+            for column in encryption_columns:
+                batch_op.drop_column(column)
+    else:
+        # SQLite 3.35+ and PostgreSQL drop the columns in place without copying the table
+        for column in encryption_columns:
+            op.drop_column('transactions', column) 
\ No newline at end of file
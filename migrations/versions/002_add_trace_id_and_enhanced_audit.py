@@ -5,6 +5,8 @@ Revises: 001_encryption_logging
 Create Date: 2024-12-20 10:00:00.000000
 
 """
+import contextlib
+
 from alembic import op
 import sqlalchemy as sa
 from sqlalchemy.dialects import postgresql
@@ -16,6 +18,49 @@ down_revision = '001_encryption_logging'
 branch_labels = None
 depends_on = None
 
+# Rows per UPDATE when backfilling audit_logs.created_at
+BACKFILL_BATCH_SIZE = 10000
+
+
+def _create_index(index_name, table_name, columns, **kw):
+    """Create an index, building it concurrently on PostgreSQL so writes aren't blocked"""
+    context = op.get_context()
+    if context.dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+        with context.autocommit_block():
+            op.create_index(index_name, table_name, columns, postgresql_concurrently=True, **kw)
+    else:
+        op.create_index(index_name, table_name, columns, **kw)
+
+
+def _backfill_audit_created_at():
+    """Copy timestamp into created_at in id ranges, committing each batch on PostgreSQL"""
+    context = op.get_context()
+    if context.as_sql:
+        # Offline SQL generation has no rows to range over
+        op.execute("UPDATE audit_logs SET created_at = timestamp WHERE created_at IS NULL")
+        return
+    
+    min_id, max_id = op.get_bind().execute(sa.text(
+        "SELECT MIN(id), MAX(id) FROM audit_logs WHERE created_at IS NULL"
+    )).one()
+    if min_id is None:
+        return
+    
+    batch_update = sa.text("""
+        UPDATE audit_logs SET created_at = timestamp 
+        WHERE created_at IS NULL AND id BETWEEN :low AND :high
+    """)
+    
+    # Short transactions per batch keep lock time and WAL growth bounded on large tables
+    if context.dialect.name == 'postgresql':
+        batches = context.autocommit_block()
+    else:
+        batches = contextlib.nullcontext()
+    with batches:
+        for low in range(min_id, max_id + 1, BACKFILL_BATCH_SIZE):
+            op.get_bind().execute(batch_update, {'low': low, 'high': low + BACKFILL_BATCH_SIZE - 1})
+
 
 def upgrade():
     """Apply the migration - add new fields and enhance audit logging"""
@@ -27,8 +72,8 @@ def upgrade():
         batch_op.add_column(sa.Column('processing_metadata', sa.Text(), nullable=True))
     
     # Create indexes for new transaction fields
-    op.create_index('idx_transactions_trace_id', 'transactions', ['trace_id'], unique=False)
-    op.create_index('idx_transactions_source', 'transactions', ['source'], unique=False)
+    _create_index('idx_transactions_trace_id', 'transactions', ['trace_id'])
+    _create_index('idx_transactions_source', 'transactions', ['source'])
     
     # 2. Enhance audit_logs table with new fields
     # First, add new columns to existing table
@@ -43,33 +88,21 @@ def upgrade():
         batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True, server_default=sa.text('CURRENT_TIMESTAMP')))
     
     # Create indexes for enhanced audit log fields
-    op.create_index('idx_audit_logs_trace_id', 'audit_logs', ['trace_id'], unique=False)
-    op.create_index('idx_audit_logs_user_id', 'audit_logs', ['user_id'], unique=False)
-    op.create_index('idx_audit_logs_entity_type', 'audit_logs', ['entity_type'], unique=False)
-    op.create_index('idx_audit_logs_created_at', 'audit_logs', ['created_at'], unique=False)
+    _create_index('idx_audit_logs_trace_id', 'audit_logs', ['trace_id'])
+    _create_index('idx_audit_logs_user_id', 'audit_logs', ['user_id'])
+    _create_index('idx_audit_logs_entity_type', 'audit_logs', ['entity_type'])
+    _create_index('idx_audit_logs_created_at', 'audit_logs', ['created_at'])
     
     # 3. Update existing transaction source values based on transaction_type
-    # For PostgreSQL
-    if op.get_context().dialect.name == 'postgresql':
-        op.execute("""
-            UPDATE transactions 
-            SET source = CASE 
-                WHEN transaction_type = 'pdf_parsed' THEN 'file_upload'::transactionsource
-                ELSE 'manual_entry'::transactionsource
-            END
-        """)
-    else:
-        # For SQLite
-        op.execute("""
-            UPDATE transactions 
-            SET source = CASE 
-                WHEN transaction_type = 'pdf_parsed' THEN 'file_upload'
-                ELSE 'manual_entry'
-            END
-        """)
+    # New rows already got 'manual_entry' from the server default, so only PDF rows change
+    op.execute("""
+        UPDATE transactions 
+        SET source = 'file_upload' 
+        WHERE transaction_type = 'pdf_parsed' AND source <> 'file_upload'
+    """)
     
     # 4. Populate created_at field with timestamp values for existing records
-    op.execute("UPDATE audit_logs SET created_at = timestamp WHERE created_at IS NULL")
+    _backfill_audit_created_at()
 
 
 def downgrade():
@@ -77,6 +110,7 @@ def downgrade():
     
     # Get database connection to check existing indexes
     conn = op.get_bind()
+    inspector = sa.inspect(conn)
     
     # Drop indexes with existence check - handle gracefully if they don't exist
     indexes_to_drop = [
@@ -88,74 +122,41 @@ def downgrade():
         ('idx_transactions_trace_id', 'transactions')
     ]
     
+    # Look up the existing indexes of both tables once rather than once per index
+    if op.get_context().dialect.name == 'postgresql':
+        result = conn.execute(sa.text("""
+            SELECT indexname FROM pg_indexes 
+            WHERE tablename IN ('audit_logs', 'transactions')
+        """))
+        existing_indexes = {row.indexname for row in result}
+    else:
+        existing_indexes = {
+            index['name']
+            for table_name in ('audit_logs', 'transactions')
+            for index in inspector.get_indexes(table_name)
+        }
+    
     for index_name, table_name in indexes_to_drop:
-        try:
-            # Check if index exists before trying to drop it
-            result = conn.execute(sa.text(f"""
-                SELECT indexname FROM pg_indexes 
-                WHERE tablename = '{table_name}' AND indexname = '{index_name}'
-            """))
-            
-            if result.fetchone():
-                op.drop_index(index_name, table_name=table_name)
-                print(f"Dropped index: {index_name}")
-            else:
-                print(f"Index {index_name} does not exist, skipping")
-        except Exception as e:
-            print(f"Warning: Could not drop index {index_name}: {e}")
-            # Continue with other indexes even if one fails
-            pass
-    
-    # Remove new columns from audit_logs table
-    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
-        # Check if columns exist before dropping them
-        try:
-            batch_op.drop_column('created_at')
-        except Exception:
-            pass
-        try:
-            batch_op.drop_column('user_agent')
-        except Exception:
-            pass
-        try:
-            batch_op.drop_column('ip_address')
-        except Exception:
-            pass
-        try:
-            batch_op.drop_column('audit_metadata')
-        except Exception:
-            pass
-        try:
-            batch_op.drop_column('entity_id')
-        except Exception:
-            pass
-        try:
-            batch_op.drop_column('entity_type')
-        except Exception:
-            pass
-        try:
-            batch_op.drop_column('user_id')
-        except Exception:
-            pass
-        try:
-            batch_op.drop_column('trace_id')
-        except Exception:
-            pass
+        if index_name in existing_indexes:
+            op.drop_index(index_name, table_name=table_name)
+            print(f"Dropped index: {index_name}")
+        else:
+            print(f"Index {index_name} does not exist, skipping")
     
-    # Remove new columns from transactions table
-    with op.batch_alter_table('transactions', schema=None) as batch_op:
-        try:
-            batch_op.drop_column('processing_metadata')
-        except Exception:
-            pass
-        try:
-            batch_op.drop_column('source')
-        except Exception:
-            pass
-        try:
-            batch_op.drop_column('trace_id')
-        except Exception:
-            pass
+    # Remove new columns, skipping any that are already gone. Each table is
+    # rebuilt at most once (SQLite) since all drops share one batch.
+    columns_to_drop = {
+        'audit_logs': ['created_at', 'user_agent', 'ip_address', 'audit_metadata',
+                       'entity_id', 'entity_type', 'user_id', 'trace_id'],
+        'transactions': ['processing_metadata', 'source', 'trace_id']
+    }
+    
+    for table_name, columns in columns_to_drop.items():
+        existing_columns = {column['name'] for column in inspector.get_columns(table_name)}
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            for column in columns:
+                if column in existing_columns:
+                    batch_op.drop_column(column)
     
     # Drop the enum type if using PostgreSQL
     if op.get_context().dialect.name == 'postgresql':
@@ -0,0 +1,62 @@
+"""Store transaction amounts as integer cents
+
+Revision ID: 2f24c13c80fc
+Revises: a616358cd8fa
+Create Date: 2025-07-10 10:00:00.000000
+
+transactions.amount NUMERIC(12, 2) becomes transactions.amount_cents BIGINT. Reads no
+longer decode a Decimal per row and SUM() aggregates run on int64; the model exposes
+the old value through the Transaction.amount hybrid property.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f24c13c80fc'
+down_revision = 'a616358cd8fa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Convert transactions.amount to integer cents in amount_cents"""
+    
+    if op.get_context().dialect.name == 'postgresql':
+        # One table rewrite; the unique constraint follows the column through the rename
+        op.alter_column('transactions', 'amount',
+                        type_=sa.BigInteger(),
+                        postgresql_using='ROUND(amount * 100)::bigint')
+        op.alter_column('transactions', 'amount', new_column_name='amount_cents')
+        return
+    
+    # SQLite can't change a column type in place, so fill a new column and rebuild the table
+    op.add_column('transactions', sa.Column('amount_cents', sa.BigInteger(), nullable=True))
+    op.execute("UPDATE transactions SET amount_cents = CAST(ROUND(amount * 100) AS INTEGER)")
+    
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_constraint('unique_transaction', type_='unique')
+        batch_op.drop_column('amount')
+        batch_op.alter_column('amount_cents', existing_type=sa.BigInteger(), nullable=False)
+        batch_op.create_unique_constraint('unique_transaction', ['date', 'description', 'amount_cents', 'account_id'])
+
+
+def downgrade():
+    """Convert amount_cents back to a NUMERIC(12, 2) amount column"""
+    
+    if op.get_context().dialect.name == 'postgresql':
+        op.alter_column('transactions', 'amount_cents', new_column_name='amount')
+        op.alter_column('transactions', 'amount',
+                        type_=sa.Numeric(12, 2),
+                        postgresql_using='amount / 100.0')
+        return
+    
+    op.add_column('transactions', sa.Column('amount', sa.Numeric(12, 2), nullable=True))
+    op.execute("UPDATE transactions SET amount = amount_cents / 100.0")
+    
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_constraint('unique_transaction', type_='unique')
+        batch_op.drop_column('amount_cents')
+        batch_op.alter_column('amount', existing_type=sa.Numeric(12, 2), nullable=False)
+        batch_op.create_unique_constraint('unique_transaction', ['date', 'description', 'amount', 'account_id'])
@@ -0,0 +1,114 @@
+"""Add composite indexes for log listing queries
+
+Revision ID: 3b7e2c9a1d44
+Revises: fbf53e4bf5a6
+Create Date: 2025-07-01 10:00:00.000000
+
+Query patterns these indexes serve (don't re-add single-column indexes on the
+leading columns, the composites already cover them):
+
+- audit_logs: WHERE user_id_hash = ? ORDER BY timestamp DESC
+- audit_logs: WHERE action = ? ORDER BY timestamp DESC
+- audit_logs: WHERE entity_type = ? AND entity_id = ? ORDER BY created_at DESC
+- audit_logs: WHERE user_id = ? ORDER BY created_at DESC
+- audit_logs: WHERE trace_id = ? (idx_audit_logs_trace_id, unchanged)
+- chat_sessions: WHERE user_id = ? ORDER BY timestamp DESC
+- llm_processing_logs: WHERE processing_type = ? ORDER BY timestamp DESC
+- chat_sessions: WHERE session_id = ? (partial index, NULL session_ids are skipped)
+
+On PostgreSQL the plain time-range indexes on these append-only tables are
+replaced with BRIN indexes, which are far smaller and cheap to maintain on insert.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e2c9a1d44'
+down_revision = 'fbf53e4bf5a6'
+branch_labels = None
+depends_on = None
+
+# Composite indexes matching "WHERE <key> = ? ORDER BY timestamp DESC LIMIT n" listings
+COMPOSITE_INDEXES = [
+    ('idx_audit_logs_user_hash_ts', 'audit_logs', ['user_id_hash', sa.text('timestamp DESC')]),
+    ('idx_audit_logs_action_ts', 'audit_logs', ['action', sa.text('timestamp DESC')]),
+    ('idx_audit_logs_entity_ts', 'audit_logs', ['entity_type', 'entity_id', sa.text('created_at DESC')]),
+    ('idx_audit_logs_user_ts', 'audit_logs', ['user_id', sa.text('created_at DESC')]),
+    ('idx_chat_sessions_user_ts', 'chat_sessions', ['user_id', sa.text('timestamp DESC')]),
+    ('idx_llm_logs_type_ts', 'llm_processing_logs', ['processing_type', sa.text('timestamp DESC')]),
+]
+
+# Single-column indexes superseded by a composite or partial index
+REDUNDANT_INDEXES = [
+    ('idx_audit_logs_user_id_hash', 'audit_logs', ['user_id_hash']),
+    ('idx_audit_logs_action', 'audit_logs', ['action']),
+    ('idx_audit_logs_entity_type', 'audit_logs', ['entity_type']),
+    ('idx_audit_logs_user_id', 'audit_logs', ['user_id']),
+    ('idx_chat_sessions_user_id', 'chat_sessions', ['user_id']),
+    ('idx_llm_logs_processing_type', 'llm_processing_logs', ['processing_type']),
+    ('idx_chat_sessions_session_id', 'chat_sessions', ['session_id']),
+]
+
+# Most chat messages carry no session_id, so only index the rows that do
+SESSION_ID_FILTER = sa.text('session_id IS NOT NULL')
+
+# B-tree indexes on append-only timestamp columns, replaced by BRIN on PostgreSQL
+TIMESTAMP_INDEXES = [
+    ('idx_audit_logs_timestamp', 'audit_logs', 'timestamp'),
+    ('idx_audit_logs_created_at', 'audit_logs', 'created_at'),
+    ('idx_chat_sessions_timestamp', 'chat_sessions', 'timestamp'),
+    ('idx_llm_logs_timestamp', 'llm_processing_logs', 'timestamp'),
+]
+
+
+def _create_index(index_name, table_name, columns, **kw):
+    """Create an index, building it concurrently on PostgreSQL so writes aren't blocked"""
+    context = op.get_context()
+    if context.dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+        with context.autocommit_block():
+            op.create_index(index_name, table_name, columns, postgresql_concurrently=True, **kw)
+    else:
+        op.create_index(index_name, table_name, columns, **kw)
+
+
+def upgrade():
+    """Replace single-column filter indexes with (filter, timestamp DESC) composites"""
+    
+    for index_name, table_name, columns in COMPOSITE_INDEXES:
+        _create_index(index_name, table_name, columns)
+    
+    _create_index('idx_chat_sessions_session_id_partial', 'chat_sessions', ['session_id'],
+                  sqlite_where=SESSION_ID_FILTER, postgresql_where=SESSION_ID_FILTER)
+    
+    for index_name, table_name, _ in REDUNDANT_INDEXES:
+        op.drop_index(index_name, table_name=table_name)
+    
+    if op.get_context().dialect.name == 'postgresql':
+        for index_name, table_name, column in TIMESTAMP_INDEXES:
+            op.drop_index(index_name, table_name=table_name)
+            _create_index(f'{index_name}_brin', table_name, [column],
+                       postgresql_using='brin', postgresql_with={'pages_per_range': 128})
+    
+    # Refresh planner statistics so the new indexes are used from the first query
+    for table_name in ('audit_logs', 'chat_sessions', 'llm_processing_logs'):
+        op.execute(f"ANALYZE {table_name}")
+
+
+def downgrade():
+    """Restore the single-column indexes and drop the composites"""
+    
+    if op.get_context().dialect.name == 'postgresql':
+        for index_name, table_name, column in TIMESTAMP_INDEXES:
+            op.drop_index(f'{index_name}_brin', table_name=table_name)
+            _create_index(index_name, table_name, [column])
+    
+    for index_name, table_name, columns in REDUNDANT_INDEXES:
+        _create_index(index_name, table_name, columns)
+    
+    op.drop_index('idx_chat_sessions_session_id_partial', table_name='chat_sessions')
+    
+    for index_name, table_name, _ in COMPOSITE_INDEXES:
+        op.drop_index(index_name, table_name=table_name)
@@ -0,0 +1,52 @@
+"""Add server-side timestamp defaults
+
+Revision ID: 8bdb88529ee1
+Revises: 2f24c13c80fc
+Create Date: 2025-07-12 10:00:00.000000
+
+created_at/updated_at on the core tables are now filled in by the database instead of
+by Python on every insert. The tables were created without column defaults, so add them.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8bdb88529ee1'
+down_revision = '2f24c13c80fc'
+branch_labels = None
+depends_on = None
+
+TIMESTAMP_COLUMNS = {
+    'transactions': ['created_at', 'updated_at'],
+    'accounts': ['created_at', 'updated_at'],
+    'categories': ['created_at'],
+    'users': ['created_at', 'updated_at'],
+}
+
+
+def _utc_now_default():
+    """Naive UTC timestamp default, matching the models' utcnow() construct"""
+    if op.get_context().dialect.name == 'postgresql':
+        return sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)")
+    return sa.text('CURRENT_TIMESTAMP')
+
+
+def _set_defaults(server_default):
+    """Set (or with None, drop) the server default of every timestamp column"""
+    for table_name, column_names in TIMESTAMP_COLUMNS.items():
+        # A metadata-only change on PostgreSQL; SQLite rebuilds each table once
+        with op.batch_alter_table(table_name) as batch_op:
+            for column_name in column_names:
+                batch_op.alter_column(column_name, existing_type=sa.DateTime(), server_default=server_default)
+
+
+def upgrade():
+    """Let the database fill in created_at/updated_at"""
+    _set_defaults(_utc_now_default())
+
+
+def downgrade():
+    """Drop the server-side timestamp defaults"""
+    _set_defaults(None)
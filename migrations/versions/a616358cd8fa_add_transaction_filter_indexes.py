@@ -0,0 +1,56 @@
+"""Add composite indexes for transaction filters
+
+Revision ID: a616358cd8fa
+Revises: 3b7e2c9a1d44
+Create Date: 2025-07-08 10:00:00.000000
+
+Dashboard and report queries filter transactions by one column and a date range:
+
+- transactions: WHERE account_id = ? AND date BETWEEN ? AND ?
+- transactions: WHERE category = ? AND date BETWEEN ? AND ?
+- transactions: WHERE is_debit = ? AND date BETWEEN ? AND ?
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a616358cd8fa'
+down_revision = '3b7e2c9a1d44'
+branch_labels = None
+depends_on = None
+
+# (filter column, date) composites; the equality column leads so the date range is a single scan
+TRANSACTION_INDEXES = [
+    ('idx_tx_account_date', 'transactions', ['account_id', 'date']),
+    ('idx_tx_category_date', 'transactions', ['category', 'date']),
+    ('idx_tx_is_debit_date', 'transactions', ['is_debit', 'date']),
+]
+
+
+def _create_index(index_name, table_name, columns, **kw):
+    """Create an index, building it concurrently on PostgreSQL so writes aren't blocked"""
+    context = op.get_context()
+    if context.dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+        with context.autocommit_block():
+            op.create_index(index_name, table_name, columns, postgresql_concurrently=True, **kw)
+    else:
+        op.create_index(index_name, table_name, columns, **kw)
+
+
+def upgrade():
+    """Add (filter column, date) composite indexes to transactions"""
+    
+    for index_name, table_name, columns in TRANSACTION_INDEXES:
+        _create_index(index_name, table_name, columns)
+    
+    # Refresh planner statistics so the new indexes are used from the first query
+    op.execute("ANALYZE transactions")
+
+
+def downgrade():
+    """Drop the transaction filter indexes"""
+    
+    for index_name, table_name, _ in TRANSACTION_INDEXES:
+        op.drop_index(index_name, table_name=table_name)
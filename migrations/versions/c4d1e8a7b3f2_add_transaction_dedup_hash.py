@@ -0,0 +1,79 @@
+"""Deduplicate transactions on a hash column
+
+Revision ID: c4d1e8a7b3f2
+Revises: 8bdb88529ee1
+Create Date: 2025-07-20 10:00:00.000000
+
+The unique_transaction constraint covered (date, description, amount_cents, account_id),
+so every insert probed a B-tree keyed on the full description text. It now covers
+dedup_hash alone: 16 hex characters of blake2b over the same four fields, filled in
+by the model on flush.
+
+"""
+import hashlib
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d1e8a7b3f2'
+down_revision = '8bdb88529ee1'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def _dedup_date(value):
+    """ISO day of a date, datetime or ISO date string (SQLite returns dates as text here)"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return value
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat() if value is not None else None
+
+
+def _dedup_hash(date, description, amount_cents, account_id):
+    """Same hash as Transaction.compute_dedup_hash at the time of this revision"""
+    key = f"{_dedup_date(date)}|{description}|{amount_cents}|{account_id}"
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+def upgrade():
+    """Add and backfill dedup_hash, then move the unique constraint onto it"""
+    
+    op.add_column('transactions', sa.Column('dedup_hash', sa.String(length=16), nullable=True))
+    
+    # blake2b isn't available in SQL on either backend, so hash existing rows here
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        "SELECT id, date, description, amount_cents, account_id FROM transactions"
+    ))
+    update = sa.text("UPDATE transactions SET dedup_hash = :dedup_hash WHERE id = :id")
+    while True:
+        rows = result.fetchmany(BACKFILL_BATCH_SIZE)
+        if not rows:
+            break
+        conn.execute(update, [
+            {'id': row.id, 'dedup_hash': _dedup_hash(row.date, row.description, row.amount_cents, row.account_id)}
+            for row in rows
+        ])
+    
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_constraint('unique_transaction', type_='unique')
+        batch_op.alter_column('dedup_hash', existing_type=sa.String(length=16), nullable=False)
+        batch_op.create_unique_constraint('unique_transaction', ['dedup_hash'])
+
+
+def downgrade():
+    """Restore the unique constraint on the transaction fields and drop dedup_hash"""
+    
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_constraint('unique_transaction', type_='unique')
+        batch_op.drop_column('dedup_hash')
+        batch_op.create_unique_constraint('unique_transaction', ['date', 'description', 'amount_cents', 'account_id'])
@@ -22,103 +22,29 @@ def upgrade():
     # Get database connection to check existing schema
     conn = op.get_bind()
     
-    # Check if audit_logs.user_id column exists
-    result = conn.execute(sa.text("""
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'audit_logs' AND column_name = 'user_id'
-    """))
-    
-    user_id_exists = result.fetchone() is not None
-    
-    if not user_id_exists:
-        # Add missing user_id column (this was supposed to be added in migration 002 but seems missing)
-        op.add_column('audit_logs', sa.Column('user_id', sa.String(36), nullable=True))
-        print("Added missing user_id column to audit_logs")
-    
-    # Check if audit_logs.entity_type column exists
-    result = conn.execute(sa.text("""
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'audit_logs' AND column_name = 'entity_type'
-    """))
-    
-    entity_type_exists = result.fetchone() is not None
-    
-    if not entity_type_exists:
-        # Add missing entity_type column
-        op.add_column('audit_logs', sa.Column('entity_type', sa.String(50), nullable=True))
-        print("Added missing entity_type column to audit_logs")
-    
-    # Check if audit_logs.entity_id column exists
-    result = conn.execute(sa.text("""
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'audit_logs' AND column_name = 'entity_id'
-    """))
-    
-    entity_id_exists = result.fetchone() is not None
-    
-    if not entity_id_exists:
-        # Add missing entity_id column
-        op.add_column('audit_logs', sa.Column('entity_id', sa.String(36), nullable=True))
-        print("Added missing entity_id column to audit_logs")
-    
-    # Check if audit_logs.audit_metadata column exists
-    result = conn.execute(sa.text("""
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'audit_logs' AND column_name = 'audit_metadata'
-    """))
-    
-    audit_metadata_exists = result.fetchone() is not None
-    
-    if not audit_metadata_exists:
-        # Add missing audit_metadata column
-        op.add_column('audit_logs', sa.Column('audit_metadata', sa.Text(), nullable=True))
-        print("Added missing audit_metadata column to audit_logs")
-    
-    # Check if audit_logs.ip_address column exists
-    result = conn.execute(sa.text("""
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'audit_logs' AND column_name = 'ip_address'
-    """))
-    
-    ip_address_exists = result.fetchone() is not None
-    
-    if not ip_address_exists:
-        # Add missing ip_address column
-        op.add_column('audit_logs', sa.Column('ip_address', sa.String(45), nullable=True))
-        print("Added missing ip_address column to audit_logs")
-    
-    # Check if audit_logs.user_agent column exists
-    result = conn.execute(sa.text("""
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'audit_logs' AND column_name = 'user_agent'
-    """))
-    
-    user_agent_exists = result.fetchone() is not None
-    
-    if not user_agent_exists:
-        # Add missing user_agent column
-        op.add_column('audit_logs', sa.Column('user_agent', sa.String(500), nullable=True))
-        print("Added missing user_agent column to audit_logs")
+    # Columns migration 002 was supposed to add, in the order they should be created
+    expected_columns = [
+        sa.Column('user_id', sa.String(36), nullable=True),
+        sa.Column('entity_type', sa.String(50), nullable=True),
+        sa.Column('entity_id', sa.String(36), nullable=True),
+        sa.Column('audit_metadata', sa.Text(), nullable=True),
+        sa.Column('ip_address', sa.String(45), nullable=True),
+        sa.Column('user_agent', sa.String(500), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True, server_default=sa.text('CURRENT_TIMESTAMP')),
+    ]
     
-    # Check if audit_logs.created_at column exists
+    # Fetch the existing audit_logs columns in one pg_catalog query (information_schema is much slower)
     result = conn.execute(sa.text("""
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'audit_logs' AND column_name = 'created_at'
-    """))
+        SELECT attname 
+        FROM pg_attribute 
+        WHERE attrelid = CAST(:table_name AS regclass) AND attnum > 0 AND NOT attisdropped
+    """), {'table_name': 'audit_logs'})
+    existing_columns = {row[0] for row in result}
     
-    created_at_exists = result.fetchone() is not None
-    
-    if not created_at_exists:
-        # Add missing created_at column
-        op.add_column('audit_logs', sa.Column('created_at', sa.DateTime(), nullable=True, server_default=sa.text('CURRENT_TIMESTAMP')))
-        print("Added missing created_at column to audit_logs")
+    for column in expected_columns:
+        if column.name not in existing_columns:
+            op.add_column('audit_logs', column)
+            print(f"Added missing {column.name} column to audit_logs")
     
     # Now add missing indexes (check if they exist first)
     indexes_to_create = [
@@ -130,16 +56,15 @@ def upgrade():
         ('idx_transactions_source', 'transactions', ['source'])
     ]
     
+    # Fetch the existing indexes of both tables in one query
+    result = conn.execute(sa.text("""
+        SELECT indexname FROM pg_indexes 
+        WHERE tablename IN ('audit_logs', 'transactions')
+    """))
+    existing_indexes = {row.indexname for row in result}
+    
     for index_name, table_name, columns in indexes_to_create:
-        # Check if index exists
-        result = conn.execute(sa.text(f"""
-            SELECT indexname FROM pg_indexes 
-            WHERE tablename = '{table_name}' AND indexname = '{index_name}'
-        """))
-        
-        index_exists = result.fetchone() is not None
-        
-        if not index_exists:
+        if index_name not in existing_indexes:
             try:
                 op.create_index(index_name, table_name, columns, unique=False)
                 print(f"Created missing index: {index_name}")
@@ -171,10 +96,10 @@ def downgrade():
     
     for index_name in indexes_to_drop:
         try:
-            result = conn.execute(sa.text(f"""
+            result = conn.execute(sa.text("""
                 SELECT indexname FROM pg_indexes 
-                WHERE indexname = '{index_name}'
-            """))
+                WHERE indexname = :index_name
+            """), {'index_name': index_name})
             
             if result.fetchone():
                 op.drop_index(index_name)
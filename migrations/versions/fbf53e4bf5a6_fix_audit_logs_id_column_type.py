@@ -20,31 +20,13 @@ def upgrade():
     """Fix audit_logs id column type from integer to varchar for UUID support"""
     
     # PostgreSQL requires special handling for primary key column type changes
-    # We need to recreate the table with the correct column types
+    # We build a replacement table, copy the rows across in one pass and swap it in
     
     conn = op.get_bind()
     
-    # First, check if we have any data to preserve
-    result = conn.execute(sa.text("SELECT COUNT(*) FROM audit_logs"))
-    row_count = result.fetchone()[0]
-    
-    print(f"Found {row_count} existing audit log records")
-    
-    if row_count > 0:
-        # Create backup table with existing data
-        print("Creating backup of existing audit_logs data...")
-        conn.execute(sa.text("""
-            CREATE TABLE audit_logs_backup AS 
-            SELECT * FROM audit_logs
-        """))
-    
-    # Drop the existing table (this will also drop all constraints and indexes)
-    print("Dropping existing audit_logs table...")
-    op.drop_table('audit_logs')
-    
-    # Recreate the table with correct column types
+    # Create the replacement table with correct column types
     print("Creating new audit_logs table with correct column types...")
-    op.create_table('audit_logs',
+    op.create_table('audit_logs_new',
         # New UUID-based primary key
         sa.Column('id', sa.String(36), nullable=False),
         
@@ -70,10 +52,39 @@ def upgrade():
         sa.Column('success', sa.Boolean(), nullable=True, default=True),
         sa.Column('error_message', sa.Text(), nullable=True),
         
-        sa.PrimaryKeyConstraint('id')
+        sa.PrimaryKeyConstraint('id', name='audit_logs_new_pkey')
     )
     
-    # Recreate indexes
+    # gen_random_uuid() is built in from PostgreSQL 13; older servers get it from pgcrypto
+    if conn.dialect.server_version_info and conn.dialect.server_version_info < (13,):
+        conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pgcrypto"))
+    
+    # Copy inside the database in a single pass; gen_random_uuid() assigns the new IDs server-side
+    print("Copying audit_logs data with new UUID IDs...")
+    result = conn.execute(sa.text("""
+        INSERT INTO audit_logs_new (
+            id, trace_id, user_id, action, entity_type, entity_id, 
+            audit_metadata, ip_address, user_agent, created_at, 
+            user_id_hash, timestamp, details, ip_address_hash, 
+            user_agent_hash, resource_type, resource_id, success, error_message
+        )
+        SELECT 
+            gen_random_uuid()::text, trace_id, user_id, action, entity_type, entity_id, 
+            audit_metadata, ip_address, user_agent, COALESCE(created_at, timestamp), 
+            user_id_hash, timestamp, details, ip_address_hash, 
+            user_agent_hash, resource_type, resource_id, success, error_message
+        FROM audit_logs 
+        ORDER BY timestamp
+    """))
+    print(f"Copied {result.rowcount} audit log records with new UUID IDs")
+    
+    # Swap the tables (dropping the old one also drops its constraints and indexes)
+    print("Replacing existing audit_logs table...")
+    op.drop_table('audit_logs')
+    op.rename_table('audit_logs_new', 'audit_logs')
+    op.execute("ALTER TABLE audit_logs RENAME CONSTRAINT audit_logs_new_pkey TO audit_logs_pkey")
+    
+    # Recreate indexes after the bulk load so they're built once instead of row by row
     print("Creating indexes...")
     op.create_index('idx_audit_logs_trace_id', 'audit_logs', ['trace_id'], unique=False)
     op.create_index('idx_audit_logs_user_id', 'audit_logs', ['user_id'], unique=False)
@@ -83,69 +94,6 @@ def upgrade():
     op.create_index('idx_audit_logs_timestamp', 'audit_logs', ['timestamp'], unique=False)
     op.create_index('idx_audit_logs_user_id_hash', 'audit_logs', ['user_id_hash'], unique=False)
     
-    # Restore data if we had any
-    if row_count > 0:
-        print("Restoring audit_logs data with new UUID IDs...")
-        
-        # Import uuid for generating new IDs
-        import uuid
-        
-        # Get all backup data
-        result = conn.execute(sa.text("SELECT * FROM audit_logs_backup ORDER BY timestamp"))
-        backup_data = result.fetchall()
-        
-        # Get column names from backup table
-        result = conn.execute(sa.text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'audit_logs_backup' 
-            ORDER BY ordinal_position
-        """))
-        backup_columns = [row[0] for row in result.fetchall()]
-        
-        # Insert data with new UUID IDs
-        for row in backup_data:
-            old_data = dict(zip(backup_columns, row))
-            new_id = str(uuid.uuid4())
-            
-            # Map old data to new structure
-            insert_data = {
-                'id': new_id,
-                'trace_id': old_data.get('trace_id'),
-                'user_id': old_data.get('user_id'),
-                'action': old_data.get('action'),
-                'entity_type': old_data.get('entity_type'),
-                'entity_id': old_data.get('entity_id'),
-                'audit_metadata': old_data.get('audit_metadata'),
-                'ip_address': old_data.get('ip_address'),
-                'user_agent': old_data.get('user_agent'),
-                'created_at': old_data.get('created_at') or old_data.get('timestamp'),
-                'user_id_hash': old_data.get('user_id_hash'),
-                'timestamp': old_data.get('timestamp'),
-                'details': old_data.get('details'),
-                'ip_address_hash': old_data.get('ip_address_hash'),
-                'user_agent_hash': old_data.get('user_agent_hash'),
-                'resource_type': old_data.get('resource_type'),
-                'resource_id': old_data.get('resource_id'),
-                'success': old_data.get('success', True),
-                'error_message': old_data.get('error_message')
-            }
-            
-            # Build insert statement
-            columns = ', '.join(insert_data.keys())
-            placeholders = ', '.join([f':{k}' for k in insert_data.keys()])
-            
-            conn.execute(sa.text(f"""
-                INSERT INTO audit_logs ({columns}) 
-                VALUES ({placeholders})
-            """), insert_data)
-        
-        print(f"Restored {len(backup_data)} audit log records with new UUID IDs")
-        
-        # Drop backup table
-        conn.execute(sa.text("DROP TABLE audit_logs_backup"))
-        print("Cleaned up backup table")
-    
     print("audit_logs table recreation completed successfully")
 
 
@@ -155,24 +103,8 @@ def downgrade():
     # This is a complex downgrade since we're changing primary key types
     # For safety, we'll preserve the data but note that UUIDs will be lost
     
-    conn = op.get_bind()
-    
-    # Check if we have data to preserve
-    result = conn.execute(sa.text("SELECT COUNT(*) FROM audit_logs"))
-    row_count = result.fetchone()[0]
-    
-    if row_count > 0:
-        # Create backup
-        conn.execute(sa.text("""
-            CREATE TABLE audit_logs_downgrade_backup AS 
-            SELECT * FROM audit_logs
-        """))
-    
-    # Drop current table
-    op.drop_table('audit_logs')
-    
-    # Recreate with original integer ID structure
-    op.create_table('audit_logs',
+    # Build the table with the original integer ID structure
+    op.create_table('audit_logs_new',
         sa.Column('id', sa.Integer(), nullable=False),
         sa.Column('action', sa.String(100), nullable=False),
         sa.Column('user_id_hash', sa.String(64), nullable=True),
@@ -184,53 +116,39 @@ def downgrade():
         sa.Column('resource_id', sa.String(50), nullable=True),
         sa.Column('success', sa.Boolean(), nullable=True, default=True),
         sa.Column('error_message', sa.Text(), nullable=True),
-        sa.PrimaryKeyConstraint('id')
+        sa.PrimaryKeyConstraint('id', name='audit_logs_new_pkey')
     )
     
-    # Recreate basic indexes
+    # Copy the basic data (UUID fields will be lost); ROW_NUMBER assigns new
+    # sequential integer IDs in timestamp order
+    op.execute("""
+        INSERT INTO audit_logs_new (
+            id, action, user_id_hash, timestamp, details, 
+            ip_address_hash, user_agent_hash, resource_type, 
+            resource_id, success, error_message
+        )
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY timestamp), action, user_id_hash, timestamp, details,
+            ip_address_hash, user_agent_hash, resource_type,
+            resource_id, success, error_message
+        FROM audit_logs
+    """)
+    
+    # Swap the tables
+    op.drop_table('audit_logs')
+    op.rename_table('audit_logs_new', 'audit_logs')
+    op.execute("ALTER TABLE audit_logs RENAME CONSTRAINT audit_logs_new_pkey TO audit_logs_pkey")
+    op.execute("ALTER SEQUENCE audit_logs_new_id_seq RENAME TO audit_logs_id_seq")
+    
+    # The copied rows bypassed the id sequence, so move it past them
+    op.execute("""
+        SELECT setval('audit_logs_id_seq', COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) 
+        FROM audit_logs
+    """)
+    
+    # Recreate basic indexes after the copy
     op.create_index('idx_audit_logs_action', 'audit_logs', ['action'], unique=False)
     op.create_index('idx_audit_logs_timestamp', 'audit_logs', ['timestamp'], unique=False)
     op.create_index('idx_audit_logs_user_id_hash', 'audit_logs', ['user_id_hash'], unique=False)
     
-    # Restore basic data if we had any (UUID fields will be lost)
-    if row_count > 0:
-        result = conn.execute(sa.text("SELECT * FROM audit_logs_downgrade_backup ORDER BY timestamp"))
-        backup_data = result.fetchall()
-        
-        for i, row in enumerate(backup_data, 1):
-            old_data = dict(zip([
-                'id', 'trace_id', 'user_id', 'action', 'entity_type', 'entity_id',
-                'audit_metadata', 'ip_address', 'user_agent', 'created_at',
-                'user_id_hash', 'timestamp', 'details', 'ip_address_hash',
-                'user_agent_hash', 'resource_type', 'resource_id', 'success', 'error_message'
-            ], row))
-            
-            # Insert with new integer ID
-            conn.execute(sa.text("""
-                INSERT INTO audit_logs (
-                    id, action, user_id_hash, timestamp, details, 
-                    ip_address_hash, user_agent_hash, resource_type, 
-                    resource_id, success, error_message
-                ) VALUES (
-                    :id, :action, :user_id_hash, :timestamp, :details,
-                    :ip_address_hash, :user_agent_hash, :resource_type,
-                    :resource_id, :success, :error_message
-                )
-            """), {
-                'id': i,
-                'action': old_data.get('action'),
-                'user_id_hash': old_data.get('user_id_hash'),
-                'timestamp': old_data.get('timestamp'),
-                'details': old_data.get('details'),
-                'ip_address_hash': old_data.get('ip_address_hash'),
-                'user_agent_hash': old_data.get('user_agent_hash'),
-                'resource_type': old_data.get('resource_type'),
-                'resource_id': old_data.get('resource_id'),
-                'success': old_data.get('success', True),
-                'error_message': old_data.get('error_message')
-            })
-        
-        # Drop backup
-        conn.execute(sa.text("DROP TABLE audit_logs_downgrade_backup"))
-    
-    print("Downgrade completed - UUID data has been lost, reverted to integer IDs") 
\ No newline at end of file
+    print("Downgrade completed - UUID data has been lost, reverted to integer IDs")
@@ -1,15 +1,105 @@
+import copy
 import json
 import hashlib
+import os
+import time
 import uuid
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from enum import Enum
+from functools import lru_cache
+from itertools import chain
 
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy import event, func, DateTime, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.sql.expression import FunctionElement
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 db = SQLAlchemy()
 
 
+def _dumps_json(value):
+    """Serialize to a JSON string for a Text column, using orjson when it is installed"""
+    if orjson is not None:
+        # json.dumps coerces int keys to strings; keep accepting them
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(value)
+
+
+def _loads_json(data):
+    """Parse a JSON column value, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dict(value):
+    """Parse a JSON column value into a dictionary, or {} if it is empty or malformed"""
+    if value:
+        try:
+            if isinstance(value, str):
+                return _loads_json(value)
+            elif isinstance(value, dict):
+                return value
+            else:
+                return {}
+        except (json.JSONDecodeError, TypeError):
+            return {}
+    return {}
+
+
+class utcnow(FunctionElement):
+    """Current UTC time as a naive timestamp, evaluated by the database"""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is already UTC
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "postgresql")
+def _postgresql_utcnow(element, compiler, **kw):
+    # CURRENT_TIMESTAMP is in the session time zone on PostgreSQL
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@lru_cache(maxsize=4096)
+def _sha256_hex(value):
+    """SHA-256 hex digest of a string; audit logs re-hash the same users, IPs and agents"""
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def _uuid7():
+    """Time-ordered UUID (version 7): 48-bit Unix milliseconds followed by random bits"""
+    unix_ms = time.time_ns() // 1_000_000
+    value = (unix_ms & ((1 << 48) - 1)) << 80 | int.from_bytes(os.urandom(10), 'big')
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+
+def _dedup_date(value):
+    """ISO day of a date, datetime or ISO date string, so all three hash the same as the Date column"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return value
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat() if value is not None else None
+
+
 # Enum for transaction source
 class TransactionSource(Enum):
     MANUAL_ENTRY = 'manual_entry'
@@ -22,59 +112,92 @@ class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, index=True)
     description = db.Column(db.Text, nullable=False)
-    amount = db.Column(db.Numeric(12, 2), nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)  # Integer cents; read and write through .amount
     category = db.Column(db.String(50), nullable=False, default="Miscellaneous")
     subcategory = db.Column(db.String(50), nullable=True)
     tags = db.Column(db.Text, nullable=True)  # JSON field for storing multiple tags
     account_id = db.Column(db.Integer, db.ForeignKey("accounts.id"), nullable=False)
     is_debit = db.Column(db.Boolean, nullable=False, default=True)
     transaction_type = db.Column(db.String(20), nullable=False, default="manual")  # manual, pdf_parsed
-    balance = db.Column(db.Numeric(12, 2), nullable=True)
+    balance = db.Column(db.Numeric(12, 2, asdecimal=False), nullable=True)  # Loaded as float, no Decimal per row
     reference_number = db.Column(db.String(100), nullable=True)
     notes = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
     
-    # New encryption fields - added for encryption support
-    encrypted_description = db.Column(db.Text, nullable=True)  # Encrypted version of description
-    encrypted_amount = db.Column(db.Text, nullable=True)  # Encrypted version of amount
-    encryption_key_id = db.Column(db.String(50), nullable=True)  # ID of encryption key used
+    # New encryption fields - added for encryption support. Only SecureTransactionService reads
+    # them, so they're deferred as a group and left out of ordinary row loads
+    encrypted_description = db.deferred(db.Column(db.Text, nullable=True), group="encryption")  # Encrypted version of description
+    encrypted_amount = db.deferred(db.Column(db.Text, nullable=True), group="encryption")  # Encrypted version of amount
+    encryption_key_id = db.deferred(db.Column(db.String(50), nullable=True), group="encryption")  # ID of encryption key used
     is_encrypted = db.Column(db.Boolean, default=False)  # Flag to indicate if transaction is encrypted
 
     # New fields for file upload tracking and audit purposes
     trace_id = db.Column(db.String(100), nullable=True, index=True)  # For tracking file upload operations
     source = db.Column(SQLEnum(TransactionSource), nullable=False, default=TransactionSource.MANUAL_ENTRY)  # Source of transaction
     processing_metadata = db.Column(db.Text, nullable=True)  # JSON field for storing processing details
+    dedup_hash = db.Column(db.String(16), nullable=False)  # Hash of date/description/amount/account, set on flush
 
     # Relationship
     account = db.relationship("Account", backref=db.backref("transactions", lazy=True))
     
-    # Add unique constraint to prevent duplicate transactions
+    # Add unique constraint to prevent duplicate transactions (on the fixed-width hash rather
+    # than the long description text), plus (filter, date) indexes for the dashboard filters
+    # (kept in sync with migrations a616358cd8fa and c4d1e8a7b3f2)
     __table_args__ = (
-        UniqueConstraint('date', 'description', 'amount', 'account_id', name='unique_transaction'),
+        UniqueConstraint('dedup_hash', name='unique_transaction'),
+        db.Index('idx_tx_account_date', 'account_id', 'date'),
+        db.Index('idx_tx_category_date', 'category', 'date'),
+        db.Index('idx_tx_is_debit_date', 'is_debit', 'date'),
     )
 
+    @staticmethod
+    def compute_dedup_hash(date, description, amount_cents, account_id):
+        """Hash the fields that identify a duplicate transaction into 16 hex characters"""
+        key = f"{_dedup_date(date)}|{description}|{amount_cents}|{account_id}"
+        return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
     def get_tags(self):
-        """Get tags as a dictionary"""
-        if self.tags:
-            try:
-                if isinstance(self.tags, str):
-                    return json.loads(self.tags)
-                elif isinstance(self.tags, dict):
-                    return self.tags
-                else:
-                    return {}
-            except (json.JSONDecodeError, TypeError):
-                return {}
-        return {}
+        """
+        Get tags as a dictionary, parsing the JSON column only when it has changed
+        
+        The dictionary is shared between calls, so treat it as read-only and change tags
+        through set_tags, add_tag or remove_tag.
+        """
+        # Keyed on the column value itself, so a refresh or direct assignment invalidates it
+        cached = getattr(self, '_tags_cache', None)
+        if cached is not None and cached[0] is self.tags:
+            return cached[1]
+
+        tags_dict = self._parse_tags()
+        self._tags_cache = (self.tags, tags_dict)
+        return tags_dict
+
+    def _parse_tags(self):
+        """Parse the tags column into a dictionary"""
+        return self.parse_tags(self.tags)
+
+    @staticmethod
+    def parse_tags(tags_json):
+        """Parse a raw tags column value, e.g. from a column-only query, into a dictionary"""
+        return _json_dict(tags_json)
 
     def set_tags(self, tags_dict):
         """Set tags from a dictionary"""
-        self.tags = json.dumps(tags_dict) if tags_dict else None
+        self.tags = _dumps_json(tags_dict) if tags_dict else None
+        # Cache a copy so later changes to the caller's dictionary can't drift from the column
+        self._tags_cache = (self.tags, copy.deepcopy(tags_dict) if tags_dict else {})
+
+    def _copy_tags(self):
+        """Editable copy of the cached tags"""
+        return {
+            tag_type: list(values) if isinstance(values, list) else values
+            for tag_type, values in self.get_tags().items()
+        }
 
     def add_tag(self, tag_type, tag_value):
         """Add a single tag"""
-        current_tags = self.get_tags()
+        current_tags = self._copy_tags()
         if tag_type not in current_tags:
             current_tags[tag_type] = []
         if tag_value not in current_tags[tag_type]:
@@ -83,7 +206,7 @@ class Transaction(db.Model):
 
     def remove_tag(self, tag_type, tag_value):
         """Remove a single tag"""
-        current_tags = self.get_tags()
+        current_tags = self._copy_tags()
         if tag_type in current_tags and tag_value in current_tags[tag_type]:
             current_tags[tag_type].remove(tag_value)
             if not current_tags[tag_type]:
@@ -92,61 +215,179 @@ class Transaction(db.Model):
 
     def get_all_tag_values(self):
         """Get all tag values as a flat list"""
-        all_tags = []
-        for tag_type, tag_values in self.get_tags().items():
-            all_tags.extend(tag_values)
-        return all_tags
+        return list(chain.from_iterable(self.get_tags().values()))
 
     def get_processing_metadata(self):
-        """Get processing metadata as a dictionary"""
-        if self.processing_metadata:
-            try:
-                if isinstance(self.processing_metadata, str):
-                    return json.loads(self.processing_metadata)
-                elif isinstance(self.processing_metadata, dict):
-                    return self.processing_metadata
-                else:
-                    return {}
-            except (json.JSONDecodeError, TypeError):
-                return {}
-        return {}
+        """
+        Get processing metadata as a dictionary, parsing the JSON column only when it has changed
+        
+        The dictionary is shared between calls, so treat it as read-only and replace it
+        through set_processing_metadata.
+        """
+        cached = getattr(self, '_processing_metadata_cache', None)
+        if cached is not None and cached[0] is self.processing_metadata:
+            return cached[1]
+
+        metadata_dict = _json_dict(self.processing_metadata)
+        self._processing_metadata_cache = (self.processing_metadata, metadata_dict)
+        return metadata_dict
 
     def set_processing_metadata(self, metadata_dict):
         """Set processing metadata from a dictionary"""
-        self.processing_metadata = json.dumps(metadata_dict) if metadata_dict else None
+        self.processing_metadata = _dumps_json(metadata_dict) if metadata_dict else None
+        # Cache a copy so later changes to the caller's dictionary can't drift from the column
+        self._processing_metadata_cache = (
+            self.processing_metadata, copy.deepcopy(metadata_dict) if metadata_dict else {}
+        )
+
+    @hybrid_property
+    def amount(self):
+        """Amount in currency units, stored as integer cents so sums stay in int64"""
+        return self.amount_cents / 100 if self.amount_cents is not None else None
+
+    @amount.inplace.setter
+    def _amount_setter(self, value):
+        self.amount_cents = self.to_cents(value)
+
+    @amount.inplace.expression
+    @classmethod
+    def _amount_expression(cls):
+        return cls.amount_cents / 100.0
+
+    @staticmethod
+    def to_cents(value):
+        """Convert an amount in currency units to integer cents, rounding half up"""
+        if value is None:
+            return None
+        cents = (Decimal(str(value)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+        return int(cents)
+
+    @classmethod
+    def bulk_ingest(cls, rows):
+        """
+        Insert many new transactions with one executemany INSERT, skipping duplicates
+        
+        Args:
+            rows: List of dictionaries of Transaction constructor arguments, with amount in
+                currency units and tags as a dictionary or an already serialized JSON string
+            
+        Returns:
+            int: Number of transactions inserted
+        """
+        # Bulk inserts bypass the attribute setters and flush events, so do their work here
+        pending = {}
+        for row in rows:
+            values = dict(row)
+            values['amount_cents'] = cls.to_cents(values.pop('amount'))
+            if 'tags' in values and not isinstance(values['tags'], str):
+                values['tags'] = _dumps_json(values['tags']) if values['tags'] else None
+            values['dedup_hash'] = cls.compute_dedup_hash(
+                values['date'], values['description'], values['amount_cents'], values['account_id']
+            )
+            # Keep the first of any duplicates within the batch, like the unique constraint would
+            pending.setdefault(values['dedup_hash'], values)
+        
+        if not pending:
+            return 0
+        
+        existing = set(db.session.scalars(db.select(cls.dedup_hash).where(cls.dedup_hash.in_(list(pending)))))
+        new_rows = [values for dedup_hash, values in pending.items() if dedup_hash not in existing]
+        if new_rows:
+            db.session.execute(db.insert(cls), new_rows)
+        return len(new_rows)
+
+    @classmethod
+    def bulk_to_dicts(cls, transactions):
+        """Serialize many transactions, reading all of their accounts' fields with one query"""
+        account_ids = {transaction.account_id for transaction in transactions}
+        account_fields = {}
+        if account_ids:
+            # Plain tuples: no Account instances to build, and no relationship access per row
+            rows = db.session.execute(
+                db.select(Account.id, Account.name, Account.account_type, Account.bank)
+                .where(Account.id.in_(account_ids))
+            )
+            account_fields = {account_id: fields for account_id, *fields in rows}
+
+        unknown_account = ("Unknown", "Unknown", "Unknown")
+        return [
+            cls._serialize(
+                transaction,
+                transaction.get_tags(),
+                transaction.get_processing_metadata(),
+                *account_fields.get(transaction.account_id, unknown_account),
+            )
+            for transaction in transactions
+        ]
+
+    @classmethod
+    def select_with_account(cls):
+        """Core select of transaction columns plus the account fields dict_from_row needs"""
+        # Skip the encrypted copies, which dict_from_row doesn't use
+        columns = [column for column in cls.__table__.c if not column.key.startswith("encrypt")]
+        return db.select(
+            *columns,
+            Account.name.label("account_name"),
+            Account.account_type.label("account_type"),
+            Account.bank.label("bank"),
+        ).outerjoin(Account)
+
+    @classmethod
+    def dict_from_row(cls, row):
+        """Serialize a select_with_account() row like to_dict, without building an ORM instance"""
+        if row.account_name is None:
+            account_fields = ("Unknown", "Unknown", "Unknown")
+        else:
+            account_fields = (row.account_name, row.account_type, row.bank)
+        return cls._serialize(row, _json_dict(row.tags), _json_dict(row.processing_metadata), *account_fields)
 
     def to_dict(self):
-        tags_dict = self.get_tags()
-        # Ensure tags_dict is always a proper dictionary
-        if not isinstance(tags_dict, dict):
-            tags_dict = {}
+        account = self.account
+        if account is None:
+            account_fields = ("Unknown", "Unknown", "Unknown")
+        else:
+            account_fields = (account.name, account.account_type, account.bank)
+        return self._serialize(self, self.get_tags(), self.get_processing_metadata(), *account_fields)
 
+    @staticmethod
+    def _serialize(values, tags_dict, processing_metadata, account_name, account_type, bank):
+        """Build the API dictionary from a Transaction or a row with the same column names"""
         return {
-            "id": self.id,
-            "date": self.date.strftime("%d/%m/%Y") if self.date else None,
-            "description": self.description,
-            "amount": float(self.amount),
-            "category": self.category,
-            "subcategory": self.subcategory,
-            "tags": tags_dict,
-            "account_name": self.account.name if self.account else "Unknown",
-            "account_type": self.account.account_type if self.account else "Unknown",
-            "bank": self.account.bank if self.account else "Unknown",
-            "is_debit": self.is_debit,
-            "type": "debit" if self.is_debit else "credit",
-            "balance": float(self.balance) if self.balance else None,
-            "reference_number": self.reference_number,
-            "notes": self.notes,
-            "transaction_type": self.transaction_type,
-            "is_encrypted": self.is_encrypted,
-            "trace_id": self.trace_id,
-            "source": self.source.value if self.source else None,
-            "processing_metadata": self.get_processing_metadata(),
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "id": values.id,
+            "date": f"{values.date.day:02d}/{values.date.month:02d}/{values.date.year}" if values.date else None,  # DD/MM/YYYY without strftime
+            "description": values.description,
+            "amount": values.amount_cents / 100,
+            "category": values.category,
+            "subcategory": values.subcategory,
+            # Ensure tags are always a proper dictionary
+            "tags": tags_dict if isinstance(tags_dict, dict) else {},
+            "account_name": account_name,
+            "account_type": account_type,
+            "bank": bank,
+            "is_debit": values.is_debit,
+            "type": "debit" if values.is_debit else "credit",
+            "balance": float(values.balance) if values.balance else None,
+            "reference_number": values.reference_number,
+            "notes": values.notes,
+            "transaction_type": values.transaction_type,
+            "is_encrypted": values.is_encrypted,
+            "trace_id": values.trace_id,
+            "source": values.source.value if values.source else None,
+            "processing_metadata": processing_metadata,
+            "created_at": values.created_at.isoformat() if values.created_at else None,
+            "updated_at": values.updated_at.isoformat() if values.updated_at else None,
         }
 
 
+@event.listens_for(Transaction, "before_insert")
+@event.listens_for(Transaction, "before_update")
+def _set_dedup_hash(mapper, connection, target):
+    """Keep dedup_hash in step with the fields it covers whenever a transaction is flushed"""
+    target.dedup_hash = Transaction.compute_dedup_hash(
+        target.date, target.description, target.amount_cents, target.account_id
+    )
+
+
 class Account(db.Model):
     __tablename__ = "accounts"
 
@@ -156,8 +397,17 @@ class Account(db.Model):
     account_type = db.Column(db.String(20), nullable=False)  # savings, checking, credit_card
     account_number = db.Column(db.String(50), nullable=True)
     is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
+
+    # Counted in SQL instead of loading every transaction; undefer it when listing accounts
+    transaction_count = db.column_property(
+        db.select(func.count(Transaction.id))
+        .where(Transaction.account_id == id)
+        .correlate_except(Transaction)
+        .scalar_subquery(),
+        deferred=True,
+    )
 
     def to_dict(self):
         return {
@@ -167,7 +417,7 @@ class Account(db.Model):
             "account_type": self.account_type,
             "account_number": self.account_number,
             "is_active": self.is_active,
-            "transaction_count": len(self.transactions),
+            "transaction_count": self.transaction_count,
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
 
@@ -180,19 +430,37 @@ class Category(db.Model):
     keywords = db.Column(db.Text, nullable=True)  # JSON string of keywords
     subcategories = db.Column(db.Text, nullable=True)  # JSON string of subcategories
     is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
 
     def get_keywords(self):
-        return json.loads(self.keywords) if self.keywords else []
+        # Categorization reads keywords for every transaction, so reuse the parse while unchanged.
+        # The list is shared between calls: treat it as read-only and replace it via set_keywords
+        cached = getattr(self, '_keywords_cache', None)
+        if cached is not None and cached[0] is self.keywords:
+            return cached[1]
+
+        keywords_list = _loads_json(self.keywords) if self.keywords else []
+        self._keywords_cache = (self.keywords, keywords_list)
+        return keywords_list
 
     def set_keywords(self, keywords_list):
-        self.keywords = json.dumps(keywords_list)
+        self.keywords = _dumps_json(keywords_list)
+        # Cache a copy so later changes to the caller's list can't drift from the column
+        self._keywords_cache = (self.keywords, list(keywords_list))
 
     def get_subcategories(self):
-        return json.loads(self.subcategories) if self.subcategories else {}
+        # Shared between calls like get_keywords: read-only, replace via set_subcategories
+        cached = getattr(self, '_subcategories_cache', None)
+        if cached is not None and cached[0] is self.subcategories:
+            return cached[1]
+
+        subcategories_dict = _loads_json(self.subcategories) if self.subcategories else {}
+        self._subcategories_cache = (self.subcategories, subcategories_dict)
+        return subcategories_dict
 
     def set_subcategories(self, subcategories_dict):
-        self.subcategories = json.dumps(subcategories_dict)
+        self.subcategories = _dumps_json(subcategories_dict)
+        self._subcategories_cache = (self.subcategories, copy.deepcopy(subcategories_dict))
 
     def to_dict(self):
         return {
@@ -212,8 +480,8 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(200), nullable=True)  # For future authentication
     is_premium = db.Column(db.Boolean, default=False)  # For PDF parsing feature
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
 
     def to_dict(self):
         return {
@@ -233,13 +501,22 @@ class ChatSession(db.Model):
     message = db.Column(db.Text, nullable=False)  # User's message/query
     response = db.Column(db.Text, nullable=False)  # LLM's response
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
-    session_id = db.Column(db.String(100), nullable=True, index=True)  # For grouping related messages
+    session_id = db.Column(db.String(100), nullable=True)  # For grouping related messages
     processing_time_ms = db.Column(db.Integer, nullable=True)  # Time taken to process the query
     tokens_used = db.Column(db.Integer, nullable=True)  # Number of tokens used (if available)
     
     # Relationship
     user = db.relationship("User", backref=db.backref("chat_sessions", lazy=True))
 
+    # Listing indexes (kept in sync with migration 3b7e2c9a1d44); most messages have no
+    # session_id, so only the rows that do are indexed
+    __table_args__ = (
+        db.Index('idx_chat_sessions_user_ts', 'user_id', db.text('timestamp DESC')),
+        db.Index('idx_chat_sessions_session_id_partial', 'session_id',
+                 sqlite_where=db.text('session_id IS NOT NULL'),
+                 postgresql_where=db.text('session_id IS NOT NULL')),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -256,10 +533,12 @@ class ChatSession(db.Model):
 class AuditLog(db.Model):
     __tablename__ = "audit_logs"
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))  # UUID primary key
+    # UUIDv7 primary key: time-ordered, so inserts append to the end of the index instead of
+    # landing on random B-tree pages the way uuid4 keys do
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(_uuid7()))
     trace_id = db.Column(db.String(100), nullable=True, index=True)  # For tracking related operations
-    user_id = db.Column(db.String(36), nullable=True, index=True)  # UUID foreign key to users
-    action = db.Column(db.String(100), nullable=False, index=True)  # e.g., 'upload_start', 'extraction_complete'
+    user_id = db.Column(db.String(36), nullable=True)  # UUID foreign key to users
+    action = db.Column(db.String(100), nullable=False)  # e.g., 'upload_start', 'extraction_complete'
     entity_type = db.Column(db.String(50), nullable=True)  # e.g., 'transaction', 'account', 'file'
     entity_id = db.Column(db.String(36), nullable=True)  # UUID of the affected entity
     audit_metadata = db.Column(db.Text, nullable=True)  # JSON field for additional details
@@ -268,7 +547,7 @@ class AuditLog(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     
     # Legacy fields for backward compatibility
-    user_id_hash = db.Column(db.String(64), nullable=True, index=True)  # Hashed user ID for privacy
+    user_id_hash = db.Column(db.String(64), nullable=True)  # Hashed user ID for privacy
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)  # Alias for created_at
     details = db.Column(db.Text, nullable=True)  # Alias for audit_metadata
     ip_address_hash = db.Column(db.String(64), nullable=True)  # Hashed IP address for privacy
@@ -278,12 +557,21 @@ class AuditLog(db.Model):
     success = db.Column(db.Boolean, default=True)  # Whether the action was successful
     error_message = db.Column(db.Text, nullable=True)  # Error message if action failed
 
+    # (filter, time DESC) composites for the audit listings (kept in sync with migration
+    # 3b7e2c9a1d44); on PostgreSQL that revision also swaps the time indexes for BRIN
+    __table_args__ = (
+        db.Index('idx_audit_logs_user_hash_ts', 'user_id_hash', db.text('timestamp DESC')),
+        db.Index('idx_audit_logs_action_ts', 'action', db.text('timestamp DESC')),
+        db.Index('idx_audit_logs_entity_ts', 'entity_type', 'entity_id', db.text('created_at DESC')),
+        db.Index('idx_audit_logs_user_ts', 'user_id', db.text('created_at DESC')),
+    )
+
     @staticmethod
     def hash_sensitive_data(data):
         """Hash sensitive data for privacy"""
         if not data:
             return None
-        return hashlib.sha256(str(data).encode()).hexdigest()
+        return _sha256_hex(str(data))
 
     @classmethod
     def log_action(cls, action, user_id=None, details=None, ip_address=None, user_agent=None, 
@@ -308,31 +596,12 @@ class AuditLog(db.Model):
             metadata: JSON metadata (preferred over details)
         """
         try:
-            # Use new fields if provided, otherwise fall back to legacy fields
-            final_entity_type = entity_type or resource_type
-            final_entity_id = entity_id or resource_id
-            final_metadata = metadata or details
-            
-            audit_log = cls(
-                trace_id=trace_id,
-                user_id=str(user_id) if user_id else None,
-                action=action,
-                entity_type=final_entity_type,
-                entity_id=str(final_entity_id) if final_entity_id else None,
-                audit_metadata=json.dumps(final_metadata) if isinstance(final_metadata, dict) else final_metadata,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                success=success,
-                error_message=error_message,
-                # Legacy fields for backward compatibility
-                user_id_hash=cls.hash_sensitive_data(user_id) if user_id else None,
-                timestamp=datetime.utcnow(),
-                details=json.dumps(final_metadata) if isinstance(final_metadata, dict) else final_metadata,
-                ip_address_hash=cls.hash_sensitive_data(ip_address) if ip_address else None,
-                user_agent_hash=cls.hash_sensitive_data(user_agent) if user_agent else None,
-                resource_type=final_entity_type,
-                resource_id=str(final_entity_id) if final_entity_id else None
-            )
+            audit_log = cls(**cls._action_values(
+                action, user_id=user_id, details=details, ip_address=ip_address, user_agent=user_agent,
+                resource_type=resource_type, resource_id=resource_id, success=success,
+                error_message=error_message, trace_id=trace_id, entity_type=entity_type,
+                entity_id=entity_id, metadata=metadata
+            ))
             
             db.session.add(audit_log)
             return audit_log
@@ -340,13 +609,90 @@ class AuditLog(db.Model):
             print(f"Error logging audit action: {e}")
             return None
 
+    @classmethod
+    def log_actions_bulk(cls, entries):
+        """
+        Log many audit actions with a single multi-row INSERT
+        
+        Args:
+            entries: List of dictionaries holding log_action keyword arguments
+            
+        Returns:
+            int: Number of rows inserted
+            
+        Raises:
+            SQLAlchemyError: If the insert fails; the caller owns the transaction and must roll back
+        """
+        if not entries:
+            return 0
+        rows = [cls._action_values(**entry) for entry in entries]
+        # Column defaults (UUID id, created_at) are filled in per row by the insert
+        db.session.execute(db.insert(cls), rows)
+        return len(rows)
+
+    @classmethod
+    def _action_values(cls, action, user_id=None, details=None, ip_address=None, user_agent=None,
+                       resource_type=None, resource_id=None, success=True, error_message=None,
+                       trace_id=None, entity_type=None, entity_id=None, metadata=None):
+        """Column values for one audit row, filling the legacy fields from the new ones if enabled"""
+        # Use new fields if provided, otherwise fall back to legacy fields
+        final_entity_type = entity_type or resource_type
+        final_entity_id = entity_id or resource_id
+        final_metadata = metadata or details
+        serialized_metadata = _dumps_json(final_metadata) if isinstance(final_metadata, dict) else final_metadata
+        
+        values = dict(
+            trace_id=trace_id,
+            user_id=str(user_id) if user_id else None,
+            action=action,
+            entity_type=final_entity_type,
+            entity_id=str(final_entity_id) if final_entity_id else None,
+            audit_metadata=serialized_metadata,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            success=success,
+            error_message=error_message,
+            timestamp=datetime.utcnow(),
+            # Still written: per-user audit listings filter on it (idx_audit_logs_user_hash_ts)
+            user_id_hash=cls.hash_sensitive_data(user_id) if user_id else None,
+        )
+        
+        # Legacy fields for backward compatibility; readers fall back to them only when the
+        # new fields are empty, so skipping them saves two hashes and the duplicate text.
+        # Outside an app context (scripts, background threads) the default applies
+        if has_app_context() and current_app.config.get('WRITE_LEGACY_AUDIT_FIELDS', False):
+            values.update(
+                details=serialized_metadata,
+                ip_address_hash=cls.hash_sensitive_data(ip_address) if ip_address else None,
+                user_agent_hash=cls.hash_sensitive_data(user_agent) if user_agent else None,
+                resource_type=final_entity_type,
+                resource_id=str(final_entity_id) if final_entity_id else None
+            )
+        return values
+
     def get_metadata(self):
-        """Get metadata as a dictionary"""
+        """
+        Get metadata as a dictionary, parsing the JSON column only when it has changed
+        
+        The dictionary is shared between calls (and with to_dict), so treat it as read-only.
+        """
         metadata_field = self.audit_metadata or self.details
+        # to_dict reads this twice (metadata and its legacy details alias)
+        cached = getattr(self, '_metadata_cache', None)
+        if cached is not None and cached[0] is metadata_field:
+            return cached[1]
+
+        metadata_dict = self._parse_metadata(metadata_field)
+        self._metadata_cache = (metadata_field, metadata_dict)
+        return metadata_dict
+
+    @staticmethod
+    def _parse_metadata(metadata_field):
+        """Parse a metadata column value into a dictionary"""
         if metadata_field:
             try:
                 if isinstance(metadata_field, str):
-                    return json.loads(metadata_field)
+                    return _loads_json(metadata_field)
                 elif isinstance(metadata_field, dict):
                     return metadata_field
                 else:
@@ -379,7 +725,7 @@ class LLMProcessingLog(db.Model):
     __tablename__ = "llm_processing_logs"
 
     id = db.Column(db.Integer, primary_key=True)
-    processing_type = db.Column(db.String(50), nullable=False, index=True)  # e.g., 'bank_statement_parsing', 'transaction_categorization', 'chat_query'
+    processing_type = db.Column(db.String(50), nullable=False)  # e.g., 'bank_statement_parsing', 'transaction_categorization', 'chat_query'
     success = db.Column(db.Boolean, nullable=False, index=True)  # Whether the LLM processing was successful
     duration_ms = db.Column(db.Integer, nullable=False)  # Processing time in milliseconds
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -393,6 +739,11 @@ class LLMProcessingLog(db.Model):
     request_size_bytes = db.Column(db.Integer, nullable=True)  # Size of the request
     response_size_bytes = db.Column(db.Integer, nullable=True)  # Size of the response
 
+    # Kept in sync with migration 3b7e2c9a1d44
+    __table_args__ = (
+        db.Index('idx_llm_logs_type_ts', 'processing_type', db.text('timestamp DESC')),
+    )
+
     @classmethod
     def log_processing(cls, processing_type, success, duration_ms, model_name=None, 
                       prompt_tokens=None, completion_tokens=None, total_tokens=None,
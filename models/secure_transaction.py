@@ -10,6 +10,7 @@ This module provides a secure wrapper around the Transaction model that handles:
 """
 
 import os
+import json
 import logging
 import uuid
 from datetime import datetime
@@ -74,24 +75,30 @@ class SecureTransaction:
     
     def _encrypt_transaction_data(self, transaction_data: Dict[str, Any]) -> Dict[str, Any]:
         """Encrypt sensitive fields in transaction data"""
+        return self._encrypt_many([transaction_data])[0]
+    
+    def _encrypt_many(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Encrypt sensitive fields in a batch of transaction data dictionaries"""
         try:
-            encrypted_data = transaction_data.copy()
-            
-            # Encrypt sensitive fields
-            sensitive_fields = {
-                'description': transaction_data.get('description'),
-                'amount': str(transaction_data.get('amount', ''))
-            }
-            
-            encrypted_fields = self.encryption.encrypt_sensitive_fields(sensitive_fields)
-            
-            # Add encrypted fields to the data
-            encrypted_data['encrypted_description'] = encrypted_fields.get('description')
-            encrypted_data['encrypted_amount'] = encrypted_fields.get('amount')
-            encrypted_data['encryption_key_id'] = self.encryption_key_id
-            encrypted_data['is_encrypted'] = True
+            encrypt_fields = self.encryption.encrypt_sensitive_fields
+            encrypted_records = []
+            for transaction_data in records:
+                encrypted_data = transaction_data.copy()
+                
+                # Encrypt sensitive fields
+                encrypted_fields = encrypt_fields({
+                    'description': transaction_data.get('description'),
+                    'amount': str(transaction_data.get('amount', ''))
+                })
+                
+                # Add encrypted fields to the data
+                encrypted_data['encrypted_description'] = encrypted_fields.get('description')
+                encrypted_data['encrypted_amount'] = encrypted_fields.get('amount')
+                encrypted_data['encryption_key_id'] = self.encryption_key_id
+                encrypted_data['is_encrypted'] = True
+                encrypted_records.append(encrypted_data)
             
-            return encrypted_data
+            return encrypted_records
             
         except EncryptionError as e:
             logger.error(f"Encryption failed: {e}")
@@ -220,6 +227,102 @@ class SecureTransaction:
             
             raise SecureTransactionError(error_msg)
     
+    def store_transactions_encrypted_bulk(self, transactions_data: List[Dict[str, Any]], user_id: Optional[str] = None,
+                                          trace_id: Optional[str] = None,
+                                          source: TransactionSource = TransactionSource.MANUAL_ENTRY,
+                                          processing_metadata: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Store many new transactions with encrypted sensitive fields in one INSERT and commit
+        
+        Args:
+            transactions_data: List of dictionaries containing transaction information
+            user_id: ID of the user creating the transactions
+            trace_id: Trace ID for tracking file upload operations
+            source: Source of the transactions (manual_entry or file_upload)
+            processing_metadata: Processing metadata shared by every transaction in the batch
+            
+        Returns:
+            int: Number of transactions inserted, excluding duplicates of existing ones
+        """
+        try:
+            # Generate trace_id if not provided
+            if not trace_id:
+                trace_id = str(uuid.uuid4())
+            
+            # Log the attempt
+            self._log_audit_action(
+                action='transaction_bulk_create_attempt',
+                user_id=user_id,
+                details={'count': len(transactions_data), 'source': source.value},
+                trace_id=trace_id
+            )
+            
+            # Encrypt sensitive data
+            encrypted_records = self._encrypt_many(transactions_data)
+            
+            metadata_json = json.dumps(processing_metadata) if processing_metadata else None
+            rows = [
+                {
+                    'date': encrypted_data.get('date'),
+                    'description': encrypted_data.get('description', ''),
+                    'amount': encrypted_data.get('amount', 0),
+                    'category': encrypted_data.get('category', 'Miscellaneous'),
+                    'subcategory': encrypted_data.get('subcategory'),
+                    'tags': encrypted_data.get('tags'),
+                    'account_id': encrypted_data.get('account_id'),
+                    'is_debit': encrypted_data.get('is_debit', True),
+                    'transaction_type': encrypted_data.get('transaction_type', 'manual'),
+                    'balance': encrypted_data.get('balance'),
+                    'reference_number': encrypted_data.get('reference_number'),
+                    'notes': encrypted_data.get('notes'),
+                    # Encryption fields
+                    'encrypted_description': encrypted_data['encrypted_description'],
+                    'encrypted_amount': encrypted_data['encrypted_amount'],
+                    'encryption_key_id': encrypted_data['encryption_key_id'],
+                    'is_encrypted': encrypted_data['is_encrypted'],
+                    # New fields
+                    'trace_id': trace_id,
+                    'source': source,
+                    'processing_metadata': metadata_json
+                }
+                for encrypted_data in encrypted_records
+            ]
+            
+            inserted_count = Transaction.bulk_ingest(rows)
+            db.session.commit()
+            
+            # Log successful creation
+            self._log_audit_action(
+                action='transactions_bulk_created',
+                user_id=user_id,
+                details={
+                    'count': inserted_count,
+                    'duplicate_count': len(rows) - inserted_count,
+                    'source': source.value,
+                    'has_processing_metadata': bool(processing_metadata)
+                },
+                trace_id=trace_id
+            )
+            
+            logger.info(f"{inserted_count} transactions created and encrypted successfully with trace_id {trace_id}")
+            return inserted_count
+            
+        except Exception as e:
+            db.session.rollback()
+            error_msg = f"Failed to store encrypted transactions: {e}"
+            logger.error(error_msg)
+            
+            # Log the failure
+            self._log_audit_action(
+                action='transaction_bulk_create_failed',
+                user_id=user_id,
+                success=False,
+                error_message=str(e),
+                trace_id=trace_id
+            )
+            
+            raise SecureTransactionError(error_msg)
+    
     def get_transactions_decrypted(self, user_id: Optional[str] = None, 
                                  filters: Optional[Dict[str, Any]] = None,
                                  limit: Optional[int] = None,
@@ -247,8 +350,8 @@ class SecureTransaction:
                 trace_id=trace_id
             )
             
-            # Build query
-            query = Transaction.query
+            # Build query, loading the deferred encrypted fields up front for decryption
+            query = Transaction.query.options(db.undefer_group('encryption'))
             
             # Apply filters
             if filters:
@@ -196,25 +196,17 @@ class UniversalLLMParser:
         
         categorized_transactions = []
         
-        for transaction in transactions:
-            try:
-                # Get description and amount for categorization
-                description = transaction.get('description', '')
-                amount = float(transaction.get('amount', 0))
-                
-                # Use LLM to categorize
-                category = self.llm_service.categorize_transaction(description, amount)
-                
-                # Add category to transaction
-                transaction['category'] = category
-                transaction['categorization_method'] = 'llm'
-                
-                self.logger.debug(f"Categorized '{description}' as '{category}'")
-                
-            except Exception as e:
-                self.logger.warning(f"Failed to categorize transaction '{transaction.get('description', '')}': {e}")
+        # One LLM call per distinct merchant rather than per transaction
+        categories = self.llm_service.categorize_transactions(transactions)
+        
+        for transaction, category in zip(transactions, categories):
+            if category is None:
                 transaction['category'] = 'Other'
                 transaction['categorization_method'] = 'fallback'
+            else:
+                transaction['category'] = category
+                transaction['categorization_method'] = 'llm'
+                self.logger.debug(f"Categorized '{transaction.get('description', '')}' as '{category}'")
             
             categorized_transactions.append(transaction)
         
@@ -500,27 +500,21 @@ def update_processing_status(trace_id, status, progress, message, task_manager):
 def store_transactions_in_db(transactions, account_id, trace_id):
     """Store transactions in the database."""
     try:
-        stored_count = 0
-        transaction_service = TransactionService()
-        
-        for txn in transactions:
-            # Convert transaction to the format expected by the database
-            transaction_data = {
+        # Convert transactions to the format expected by the database
+        transactions_data = [
+            {
                 'account_id': account_id,
                 'date': txn['date'],
                 'description': txn['description'],
                 'amount': txn['amount'],
                 'transaction_type': txn['type'],
                 'category': 'Uncategorized',  # Will be categorized later
-                'trace_id': trace_id
             }
-            
-            # Store in database
-            result = transaction_service.create_transaction(transaction_data)
-            if result:
-                stored_count += 1
+            for txn in transactions
+        ]
         
-        return stored_count
+        # Store in database with one insert and commit; already stored rows are skipped
+        return TransactionService.create_transactions_bulk(transactions_data, trace_id=trace_id)
     except Exception as e:
         raise Exception(f"Failed to store transactions: {e}")
 
@@ -8,14 +8,13 @@ This script safely updates the database schema to add:
 3. Performance indexes
 
 Usage:
-    python scripts/database_migration.py [--dry-run] [--backup]
+    python scripts/database_migration.py [--dry-run] [--backup] [--explain]
 """
 
 import sqlite3
 import os
 import sys
 import argparse
-import shutil
 from datetime import datetime
 
 
@@ -26,12 +25,24 @@ def get_db_path():
     return os.path.join(project_root, 'instance', 'personal_finance.db')
 
 
+def copy_database(source_path, target_path):
+    """Copy a database with SQLite's online backup API (safe while the source is in use)"""
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        with target:
+            source.backup(target, pages=1000)
+    finally:
+        source.close()
+        target.close()
+
+
 def create_backup(db_path):
     """Create a backup of the current database"""
     if os.path.exists(db_path):
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_path = f"{db_path}.backup_{timestamp}"
-        shutil.copy2(db_path, backup_path)
+        copy_database(db_path, backup_path)
         print(f"✅ Database backed up to: {backup_path}")
         return backup_path
     else:
@@ -39,17 +50,33 @@ def create_backup(db_path):
         return None
 
 
+def configure_connection(conn):
+    """Apply fast, migration-only pragmas and return the journal mode to restore afterwards"""
+    previous_journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-200000")  # ~200MB page cache
+    conn.execute("PRAGMA mmap_size=268435456")
+    return previous_journal_mode
+
+
 def check_table_exists(cursor, table_name):
     """Check if a table exists"""
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
     return cursor.fetchone() is not None
 
 
-def check_column_exists(cursor, table_name, column_name):
-    """Check if a column exists in a table"""
+def get_table_names(cursor):
+    """Get the names of all tables with a single sqlite_master read"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    return frozenset(row[0] for row in cursor.fetchall())
+
+
+def get_table_columns(cursor, table_name):
+    """Get the column names of a table with a single PRAGMA read"""
     cursor.execute(f"PRAGMA table_info({table_name})")
-    columns = [column[1] for column in cursor.fetchall()]
-    return column_name in columns
+    return frozenset(column[1] for column in cursor.fetchall())
 
 
 def apply_migration(cursor, dry_run=False):
@@ -68,8 +95,9 @@ def apply_migration(cursor, dry_run=False):
         ('is_encrypted', 'BOOLEAN DEFAULT 0')
     ]
     
+    transaction_columns = get_table_columns(cursor, 'transactions')
     for field_name, field_type in encryption_fields:
-        if not check_column_exists(cursor, 'transactions', field_name):
+        if field_name not in transaction_columns:
             sql = f"ALTER TABLE transactions ADD COLUMN {field_name} {field_type}"
             print(f"   + Adding column: {field_name}")
             if not dry_run:
@@ -157,23 +185,55 @@ def apply_migration(cursor, dry_run=False):
     # 5. Create performance indexes
     print("\n📝 Creating performance indexes...")
     
+    # Listings filter on one column and sort newest first, so those get composite indexes
+    # Entries are (name, table, columns, partial index filter)
     indexes = [
-        ('idx_chat_sessions_timestamp', 'chat_sessions', 'timestamp'),
-        ('idx_chat_sessions_session_id', 'chat_sessions', 'session_id'),
-        ('idx_audit_logs_action', 'audit_logs', 'action'),
-        ('idx_audit_logs_timestamp', 'audit_logs', 'timestamp'),
-        ('idx_llm_logs_processing_type', 'llm_processing_logs', 'processing_type'),
-        ('idx_llm_logs_timestamp', 'llm_processing_logs', 'timestamp'),
+        ('idx_chat_sessions_timestamp', 'chat_sessions', 'timestamp', None),
+        ('idx_chat_sessions_session_id_partial', 'chat_sessions', 'session_id', 'session_id IS NOT NULL'),
+        ('idx_chat_sessions_user_ts', 'chat_sessions', 'user_id, timestamp DESC', None),
+        ('idx_audit_logs_timestamp', 'audit_logs', 'timestamp', None),
+        ('idx_audit_logs_user_hash_ts', 'audit_logs', 'user_id_hash, timestamp DESC', None),
+        ('idx_audit_logs_action_ts', 'audit_logs', 'action, timestamp DESC', None),
+        ('idx_llm_logs_timestamp', 'llm_processing_logs', 'timestamp', None),
+        ('idx_llm_logs_type_ts', 'llm_processing_logs', 'processing_type, timestamp DESC', None),
     ]
     
-    for index_name, table_name, column_name in indexes:
-        if check_table_exists(cursor, table_name):
-            sql = f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name}({column_name})"
+    existing_tables = get_table_names(cursor)
+    for index_name, table_name, columns, where in indexes:
+        if table_name in existing_tables:
+            sql = f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name}({columns})"
+            if where:
+                sql += f" WHERE {where}"
             print(f"   + Creating index: {index_name}")
             if not dry_run:
                 cursor.execute(sql)
             updates_applied.append(f"Created index {index_name}")
     
+    # Single-column indexes superseded by the composite and partial indexes above
+    redundant_indexes = [
+        'idx_chat_sessions_session_id',
+        'idx_chat_sessions_user_id',
+        'idx_audit_logs_user_id_hash',
+        'idx_audit_logs_action',
+        'idx_llm_logs_processing_type',
+    ]
+    
+    cursor.execute(
+        f"SELECT name FROM sqlite_master WHERE type='index' AND name IN ({', '.join('?' * len(redundant_indexes))})",
+        redundant_indexes
+    )
+    for (index_name,) in cursor.fetchall():
+        print(f"   - Dropping redundant index: {index_name}")
+        if not dry_run:
+            cursor.execute(f"DROP INDEX {index_name}")
+        updates_applied.append(f"Dropped index {index_name}")
+    
+    # 6. Gather planner statistics so the new indexes are chosen from the first query
+    print("\n📝 Analyzing tables...")
+    for table_name in ('transactions', 'chat_sessions', 'audit_logs', 'llm_processing_logs'):
+        if not dry_run and table_name in existing_tables:
+            cursor.execute(f"ANALYZE {table_name}")
+    
     return updates_applied
 
 
@@ -183,8 +243,7 @@ def verify_migration(cursor):
     
     # Check transactions table has new columns
     required_columns = ['encrypted_description', 'encrypted_amount', 'encryption_key_id', 'is_encrypted']
-    cursor.execute("PRAGMA table_info(transactions)")
-    columns = [column[1] for column in cursor.fetchall()]
+    columns = get_table_columns(cursor, 'transactions')
     
     for col in required_columns:
         if col in columns:
@@ -195,8 +254,13 @@ def verify_migration(cursor):
     
     # Check new tables exist
     required_tables = ['chat_sessions', 'audit_logs', 'llm_processing_logs']
+    cursor.execute(
+        f"SELECT name FROM sqlite_master WHERE type='table' AND name IN ({', '.join('?' * len(required_tables))})",
+        required_tables
+    )
+    found_tables = {row[0] for row in cursor.fetchall()}
     for table in required_tables:
-        if check_table_exists(cursor, table):
+        if table in found_tables:
             print(f"   ✅ {table} table exists")
         else:
             print(f"   ❌ {table} table missing")
@@ -206,12 +270,75 @@ def verify_migration(cursor):
     return True
 
 
+# Listing queries the composite indexes serve, checked against the migrated schema by --explain
+LISTING_QUERIES = [
+    ("SELECT * FROM chat_sessions WHERE user_id = ? ORDER BY timestamp DESC LIMIT 50", (1,)),
+    ("SELECT * FROM chat_sessions WHERE session_id = ?", ('session',)),
+    ("SELECT * FROM audit_logs WHERE user_id_hash = ? ORDER BY timestamp DESC LIMIT 50", ('hash',)),
+    ("SELECT * FROM audit_logs WHERE action = ? ORDER BY timestamp DESC LIMIT 50", ('login',)),
+    ("SELECT * FROM llm_processing_logs WHERE processing_type = ? ORDER BY timestamp DESC LIMIT 50", ('chat_query',)),
+]
+
+
+def explain_query(cursor, sql, parameters=()):
+    """Print the query plan for a statement, warning when it sorts every matching row"""
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+    for row in cursor.fetchall():
+        detail = row[-1]
+        print(f"      plan: {detail}")
+        if 'USE TEMP B-TREE FOR ORDER BY' in detail:
+            print("      ⚠️  Sorts in a temp B-tree - needs a (filter, sort column) composite index")
+
+
+class ExplainCursor:
+    """Cursor wrapper that prints each statement, and the plan of each query, before running it"""
+    
+    PLANNED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE', 'INSERT')
+    
+    def __init__(self, cursor):
+        self.cursor = cursor
+    
+    def execute(self, sql, parameters=()):
+        statement = ' '.join(sql.split())
+        if not statement.upper().startswith('PRAGMA'):
+            print(f"\n   SQL> {statement}")
+            if statement.split(' ', 1)[0].upper() in self.PLANNED_STATEMENTS:
+                explain_query(self.cursor, statement, parameters)
+        return self.cursor.execute(sql, parameters)
+    
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def explain_migration(db_path):
+    """Run the migration against an in-memory copy of the database and print every plan"""
+    source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn = sqlite3.connect(':memory:')
+    try:
+        source.backup(conn)
+        
+        updates_applied = apply_migration(ExplainCursor(conn.cursor()))
+        
+        print("\n📝 Checking listing queries against the migrated schema...")
+        cursor = conn.cursor()
+        for sql, parameters in LISTING_QUERIES:
+            print(f"\n   SQL> {sql}")
+            explain_query(cursor, sql, parameters)
+        
+        print(f"\n📋 Explained {len(updates_applied)} updates - {db_path} was not modified")
+    finally:
+        source.close()
+        conn.close()
+
+
 def main():
     """Main function"""
     parser = argparse.ArgumentParser(description='Migrate database schema for encryption and logging')
     parser.add_argument('--dry-run', action='store_true', help='Show what would be done without making changes')
     parser.add_argument('--backup', action='store_true', help='Create a backup before applying changes')
     parser.add_argument('--force', action='store_true', help='Apply changes without confirmation')
+    parser.add_argument('--explain', action='store_true',
+                        help='Print each statement with its query plan, using an in-memory copy of the database')
     
     args = parser.parse_args()
     
@@ -220,13 +347,20 @@ def main():
     print("🗄️  Personal Finance Database Migration")
     print("=" * 50)
     print(f"Database: {db_path}")
-    print(f"Mode: {'DRY RUN' if args.dry_run else 'LIVE MIGRATION'}")
+    if args.explain:
+        print("Mode: EXPLAIN")
+    else:
+        print(f"Mode: {'DRY RUN' if args.dry_run else 'LIVE MIGRATION'}")
     
     if not os.path.exists(db_path):
         print(f"❌ Database file not found: {db_path}")
         print("   Please ensure the application has been run at least once.")
         sys.exit(1)
     
+    if args.explain:
+        explain_migration(db_path)
+        return
+    
     # Create backup if requested
     backup_path = None
     if args.backup and not args.dry_run:
@@ -239,15 +373,23 @@ def main():
             print("❌ Operation cancelled")
             sys.exit(0)
     
+    conn = None
+    previous_journal_mode = None
     try:
-        conn = sqlite3.connect(db_path)
+        # Manage the transaction explicitly: in the default mode each DDL statement
+        # commits (and syncs the journal) on its own
+        conn = sqlite3.connect(db_path, isolation_level=None)
         cursor = conn.cursor()
         
+        if not args.dry_run:
+            previous_journal_mode = configure_connection(conn)
+            cursor.execute("BEGIN IMMEDIATE")
+        
         # Apply migration
         updates_applied = apply_migration(cursor, dry_run=args.dry_run)
         
         if not args.dry_run:
-            conn.commit()
+            cursor.execute("COMMIT")
             print(f"\n✅ Applied {len(updates_applied)} updates")
             
             # Verify the migration
@@ -265,16 +407,39 @@ def main():
     except Exception as e:
         print(f"❌ Migration failed: {e}")
         
-        # Restore from backup if available
-        if backup_path and os.path.exists(backup_path) and not args.dry_run:
+        # Undo any partially applied statements. Every step checks whether it is already
+        # applied, so after a rollback the migration can simply be run again.
+        rolled_back = False
+        if conn is not None and conn.in_transaction:
+            try:
+                conn.execute("ROLLBACK")
+                rolled_back = True
+                print("↩️  Rolled back uncommitted changes")
+            except sqlite3.Error as rollback_error:
+                print(f"❌ Rollback failed: {rollback_error}")
+        
+        # Restoring the whole file is only needed when the rollback couldn't undo the changes
+        if not rolled_back and backup_path and os.path.exists(backup_path) and not args.dry_run:
             print(f"💾 Restoring from backup: {backup_path}")
-            shutil.copy2(backup_path, db_path)
+            copy_database(backup_path, db_path)
             print("✅ Database restored from backup")
         
         sys.exit(1)
     
     finally:
-        conn.close()
+        if conn is not None:
+            # journal_mode persists in the database file, so put back what the app was using.
+            # SQLite can't leave WAL inside an open transaction (a failed rollback leaves one), and
+            # an error here must not mask the original failure
+            if previous_journal_mode and previous_journal_mode.lower() != 'wal':
+                if conn.in_transaction:
+                    print(f"⚠️  Transaction still open, leaving journal_mode as WAL (was {previous_journal_mode})")
+                else:
+                    try:
+                        conn.execute(f"PRAGMA journal_mode={previous_journal_mode}")
+                    except sqlite3.Error as pragma_error:
+                        print(f"⚠️  Could not restore journal_mode={previous_journal_mode}: {pragma_error}")
+            conn.close()
 
 
 if __name__ == "__main__":
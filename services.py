@@ -5,8 +5,10 @@ import os
 import io
 import csv
 import json
+import re
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, Tuple
 
 try:
     import pandas as pd
@@ -33,7 +35,7 @@ except ImportError:
 
 from sqlalchemy import desc
 
-from models import Account, Category, Transaction, User, db, AuditLog
+from models import Account, Category, Transaction, TransactionSource, User, db, AuditLog
 from models.secure_transaction import SecureTransaction, SecureTransactionError
 from llm_services.llm_service import LLMService, LLMServiceError
 
@@ -46,6 +48,40 @@ class TransactionService:
     def __init__(self):
         self.secure_transaction = SecureTransaction()
 
+    @staticmethod
+    def _prepare_transaction_data(data):
+        """Normalize request or parser data into SecureTransaction's transaction fields"""
+        # Parse date - handle both HTML date input format (YYYY-MM-DD) and legacy format (DD/MM/YYYY)
+        if isinstance(data.get("date"), str):
+            date_str = data["date"]
+            try:
+                # Try HTML date input format first (YYYY-MM-DD)
+                date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+            except ValueError:
+                try:
+                    # Fall back to legacy format (DD/MM/YYYY)
+                    date_obj = datetime.strptime(date_str, "%d/%m/%Y").date()
+                except ValueError:
+                    # If both fail, use current date
+                    date_obj = datetime.now().date()
+        else:
+            date_obj = data.get("date", datetime.now().date())
+
+        return {
+            'date': date_obj,
+            'description': data["description"],
+            'amount': float(data["amount"]),
+            'category': data.get("category", "Miscellaneous"),
+            'subcategory': data.get("subcategory"),
+            'account_id': data["account_id"],
+            'is_debit': data.get("is_debit", True),
+            'transaction_type': data.get("transaction_type", "manual"),
+            'balance': data.get("balance"),
+            'reference_number': data.get("reference_number"),
+            'notes': data.get("notes"),
+            'tags': data.get("tags")
+        }
+
     @staticmethod
     def create_transaction(data):
         """Create a new transaction using secure encryption"""
@@ -53,37 +89,8 @@ class TransactionService:
             # Initialize secure transaction handler
             secure_tx = SecureTransaction()
             
-            # Parse date - handle both HTML date input format (YYYY-MM-DD) and legacy format (DD/MM/YYYY)
-            if isinstance(data.get("date"), str):
-                date_str = data["date"]
-                try:
-                    # Try HTML date input format first (YYYY-MM-DD)
-                    date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-                except ValueError:
-                    try:
-                        # Fall back to legacy format (DD/MM/YYYY)
-                        date_obj = datetime.strptime(date_str, "%d/%m/%Y").date()
-                    except ValueError:
-                        # If both fail, use current date
-                        date_obj = datetime.now().date()
-            else:
-                date_obj = data.get("date", datetime.now().date())
-
             # Prepare transaction data
-            transaction_data = {
-                'date': date_obj,
-                'description': data["description"],
-                'amount': float(data["amount"]),
-                'category': data.get("category", "Miscellaneous"),
-                'subcategory': data.get("subcategory"),
-                'account_id': data["account_id"],
-                'is_debit': data.get("is_debit", True),
-                'transaction_type': data.get("transaction_type", "manual"),
-                'balance': data.get("balance"),
-                'reference_number': data.get("reference_number"),
-                'notes': data.get("notes"),
-                'tags': data.get("tags")
-            }
+            transaction_data = TransactionService._prepare_transaction_data(data)
 
             # Create transaction using secure method
             transaction_id = secure_tx.store_transaction_encrypted(
@@ -102,6 +109,27 @@ class TransactionService:
             db.session.rollback()
             raise e
 
+    @staticmethod
+    def create_transactions_bulk(data_list, user_id=None, trace_id=None):
+        """
+        Create many transactions using secure encryption, with one insert and one commit
+        
+        Args:
+            data_list: List of transaction dictionaries in create_transaction's format
+            user_id: ID of the user creating the transactions
+            trace_id: Trace ID for tracking file upload operations
+            
+        Returns:
+            int: Number of transactions created; rows already stored are skipped
+        """
+        secure_tx = SecureTransaction()
+        return secure_tx.store_transactions_encrypted_bulk(
+            [TransactionService._prepare_transaction_data(data) for data in data_list],
+            user_id=user_id,
+            trace_id=trace_id,
+            source=TransactionSource.FILE_UPLOAD
+        )
+
     @staticmethod
     def update_transaction(transaction_id, data):
         """Update an existing transaction using secure encryption"""
@@ -455,13 +483,21 @@ class TransactionService:
     def get_tag_analytics():
         """Get analytics based on tags"""
         try:
-            transactions = Transaction.query.all()
+            # Only the three columns used, and untagged rows never leave the database
+            rows = db.session.execute(
+                db.select(Transaction.tags, Transaction.amount_cents, Transaction.is_debit)
+                .where(Transaction.tags.isnot(None))
+            )
 
             tag_stats = {"categories": {}, "accounts": {}}
+            # Transactions from the same upload share identical tag JSON, so parse each once
+            parsed_tags = {}
 
-            for transaction in transactions:
-                tags = transaction.get_tags()
-                amount = float(transaction.amount)
+            for tags_json, amount_cents, is_debit in rows:
+                tags = parsed_tags.get(tags_json)
+                if tags is None:
+                    tags = parsed_tags[tags_json] = Transaction.parse_tags(tags_json)
+                amount = amount_cents / 100
 
                 for tag_type, tag_values in tags.items():
                     if tag_type in tag_stats:
@@ -472,7 +508,7 @@ class TransactionService:
                             tag_stats[tag_type][tag_value]["total"] += amount
                             tag_stats[tag_type][tag_value]["count"] += 1
 
-                            if transaction.is_debit:
+                            if is_debit:
                                 tag_stats[tag_type][tag_value]["expenses"] += amount
                             else:
                                 tag_stats[tag_type][tag_value]["income"] += amount
@@ -483,6 +519,32 @@ class TransactionService:
             return {}
 
 
+@lru_cache(maxsize=8)
+def _build_keyword_matcher(category_keywords: Tuple[Tuple[str, Tuple[str, ...]], ...]):
+    """
+    Compile every category keyword into a single regex scan.
+
+    Args:
+        category_keywords: (category name, keywords) pairs in priority order
+
+    Returns:
+        Tuple of the compiled pattern (None if there are no keywords) and a dict mapping
+        each lowercased keyword to the (priority, name) of the first category listing it
+    """
+    keyword_categories = {}
+    for priority, (name, keywords) in enumerate(category_keywords):
+        for keyword in keywords:
+            keyword_categories.setdefault(keyword.lower(), (priority, name))
+
+    if not keyword_categories:
+        return None, keyword_categories
+
+    # The lookahead reports a match at every position, overlapping ones included, and
+    # alternatives are tried in priority order, so the best category is never skipped
+    alternatives = '|'.join(re.escape(keyword) for keyword in keyword_categories)
+    return re.compile(f'(?=({alternatives}))'), keyword_categories
+
+
 class CategoryService:
 
     @staticmethod
@@ -520,15 +582,22 @@ class CategoryService:
             if keyword in description:
                 return "Income"
 
-        # Rule-based categorization using database categories
+        # Rule-based categorization using database categories; the first category with a
+        # keyword in the description wins, found with one scan over the description
         categories = Category.query.filter_by(is_active=True).all()
-        for category in categories:
-            keywords = category.get_keywords()
-            for keyword in keywords:
-                if keyword.lower() in description:
-                    return category.name
+        pattern, keyword_categories = _build_keyword_matcher(
+            tuple((category.name, tuple(category.get_keywords())) for category in categories)
+        )
+        if pattern is None:
+            return "Miscellaneous"
 
-        return "Miscellaneous"
+        best = None
+        for match in pattern.finditer(description):
+            candidate = keyword_categories[match.group(1)]
+            if best is None or candidate < best:
+                best = candidate
+
+        return best[1] if best else "Miscellaneous"
 
     @staticmethod
     def categorize_subcategory(description, category):
@@ -840,6 +909,60 @@ class AuditService:
                 pass
             return None
     
+    @staticmethod
+    def log_actions(trace_id: str, user_id: Optional[str],
+                    actions: List[Tuple[str, Optional[Dict[str, Any]]]]) -> int:
+        """
+        Log several audit actions for one operation with a single insert and commit
+        
+        Args:
+            trace_id: Trace ID for tracking related operations
+            user_id: ID of the user performing the actions
+            actions: List of (action, metadata) pairs
+            
+        Returns:
+            int: Number of audit log entries created
+        """
+        if not actions:
+            return 0
+        
+        try:
+            # Get request information
+            ip_address = None
+            user_agent = None
+            
+            try:
+                if request:
+                    ip_address = request.remote_addr
+                    user_agent = request.headers.get('User-Agent')
+            except RuntimeError:
+                # Outside request context
+                pass
+            
+            created = AuditLog.log_actions_bulk([
+                {
+                    'action': action,
+                    'user_id': user_id,
+                    'trace_id': trace_id,
+                    'metadata': metadata,
+                    'ip_address': ip_address,
+                    'user_agent': user_agent,
+                }
+                for action, metadata in actions
+            ])
+            
+            if created:
+                db.session.commit()
+            return created
+                
+        except Exception as e:
+            print(f"Error logging audit actions for trace_id {trace_id}: {e}")
+            try:
+                db.session.rollback()
+            except:
+                pass
+            return 0
+    
     @staticmethod
     def get_audit_trail(trace_id: str) -> List[AuditLog]:
         """
@@ -1432,21 +1555,18 @@ class DocumentProcessingService:
     def _apply_business_logic_validation(self, transactions: List[dict], trace_id: str, user_id: str) -> List[dict]:
         """Apply business logic validation to normalized transactions."""
         validated_transactions = []
+        # Warnings are written together once the batch is validated
+        flagged_actions = []
         
         for i, transaction in enumerate(transactions):
             try:
                 # Validate amount ranges
                 if transaction['amount'] > 1000000:  # 10 lakh
-                    self.audit_service.log_action(
-                        trace_id=trace_id,
-                        user_id=user_id,
-                        action="high_value_transaction_detected",
-                        metadata={
-                            "transaction_index": i,
-                            "amount": transaction['amount'],
-                            "description": transaction['description']
-                        }
-                    )
+                    flagged_actions.append(("high_value_transaction_detected", {
+                        "transaction_index": i,
+                        "amount": transaction['amount'],
+                        "description": transaction['description']
+                    }))
                 
                 # Validate date ranges (not too far in future/past)
                 today = datetime.now().date()
@@ -1457,16 +1577,11 @@ class DocumentProcessingService:
                 
                 days_diff = abs((today - transaction_date).days)
                 if days_diff > 365 * 2:  # More than 2 years
-                    self.audit_service.log_action(
-                        trace_id=trace_id,
-                        user_id=user_id,
-                        action="unusual_date_detected",
-                        metadata={
-                            "transaction_index": i,
-                            "date": transaction_date.isoformat(),
-                            "days_difference": days_diff
-                        }
-                    )
+                    flagged_actions.append(("unusual_date_detected", {
+                        "transaction_index": i,
+                        "date": transaction_date.isoformat(),
+                        "days_difference": days_diff
+                    }))
                 
                 # Ensure category is not null
                 if not transaction.get('category'):
@@ -1485,6 +1600,8 @@ class DocumentProcessingService:
                 # Continue with other transactions
                 continue
         
+        self.audit_service.log_actions(trace_id, user_id, flagged_actions)
+        
         return validated_transactions
     
     def _extract_file_content(self, file, file_type: str) -> str:
@@ -0,0 +1,331 @@
+"""
+Test LLM Service
+Unit tests for the response parsing helpers in LLMService. No LLM endpoint is required.
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import requests
+
+from llm_services.bank_parsers import parse_known_format
+from llm_services.llm_service import LLMService, LLMServiceError, _iter_chunks
+
+
+@pytest.fixture
+def llm_service():
+    """LLM service pointed at a dummy endpoint"""
+    return LLMService(endpoint='http://localhost:11434')
+
+
+class TestExtractJsonArray:
+    """Test JSON array extraction from raw LLM responses"""
+
+    def test_array_surrounded_by_prose(self, llm_service):
+        """Test extracting an array embedded in explanatory text"""
+        response = 'Here you go: [{"date": "2025-03-01", "description": "ATM", "amount": 10, "type": "debit"}] Done!'
+        result = json.loads(llm_service._extract_json_array(response))
+        assert result == [{"date": "2025-03-01", "description": "ATM", "amount": 10, "type": "debit"}]
+
+    def test_markdown_fenced_array(self, llm_service):
+        """Test extracting an array wrapped in a markdown code block"""
+        response = '```json\n[{"date": "2025-03-01", "description": "ATM", "amount": 10, "type": "debit"}]\n```'
+        result = json.loads(llm_service._extract_json_array(response))
+        assert len(result) == 1
+
+    def test_array_with_trailing_comma(self, llm_service):
+        """Test that malformed arrays are repaired rather than truncated"""
+        response = (
+            '[{"date": "2025-03-01", "description": "A", "amount": 1, "type": "debit"},'
+            ' {"date": "2025-03-02", "description": "B", "amount": 2, "type": "credit"},]'
+        )
+        result = json.loads(llm_service._extract_json_array(response))
+        assert [t['description'] for t in result] == ['A', 'B']
+
+    def test_array_nested_in_object(self, llm_service):
+        """Test extracting an array from a wrapping object"""
+        response = '{"transactions": [{"date": "2025-03-01", "description": "A", "amount": 1, "type": "debit"}]}'
+        result = json.loads(llm_service._extract_json_array(response))
+        assert result[0]['description'] == 'A'
+
+    def test_single_transaction_object(self, llm_service):
+        """Test wrapping a lone transaction object into an array"""
+        response = 'Result: {"date": "2025-03-01", "description": "A", "amount": 1, "type": "debit"}'
+        result = json.loads(llm_service._extract_json_array(response))
+        assert result == [{"date": "2025-03-01", "description": "A", "amount": 1, "type": "debit"}]
+
+
+class TestSanitizeJson:
+    """Test repair of malformed LLM JSON"""
+
+    @pytest.mark.parametrize('raw, expected', [
+        ('```json\n[{"date": "2025-03-01", "description": "ATM\nwithdrawal   here", "amount": "₹2,000.50", "type": "debit"},]\n```',
+         [{'date': '2025-03-01', 'description': 'ATM withdrawal here', 'amount': 2000.5, 'type': 'debit'}]),
+        ("[{'date': '2025-03-01', 'description': 'Salary', 'amount': 78,791.65, 'type': 'credit'}]",
+         [{'date': '2025-03-01', 'description': 'Salary', 'amount': 78791.65, 'type': 'credit'}]),
+        ('[{"date": "2025-03-01", "description": "X", "amount": - 500, "type": "debit"}, {"date": "2025-03-02", "desc',
+         [{'date': '2025-03-01', 'description': 'X', 'amount': -500, 'type': 'debit'}]),
+        ('[{"date":"2025-03-01","description":"X","amount":"$ 12.00","type":"debit"}]',
+         [{'date': '2025-03-01', 'description': 'X', 'amount': 12.0, 'type': 'debit'}]),
+    ])
+    def test_repairs_common_llm_mistakes(self, llm_service, raw, expected):
+        """Test fences, control chars, quotes, currency, thousands separators and truncation"""
+        assert json.loads(llm_service._sanitize_json_string(raw)) == expected
+
+    def test_small_integer_lists_are_not_merged(self, llm_service):
+        """Test that commas between short numbers are not treated as thousands separators"""
+        assert json.loads(llm_service._sanitize_json_string('[1,2,30]')) == [1, 2, 30]
+
+
+def _stream_response(fragments):
+    """Build a mock streaming Ollama response yielding the given text fragments"""
+    lines = [json.dumps({'response': f, 'done': False}).encode() for f in fragments]
+    lines.append(json.dumps({'response': '', 'done': True}).encode())
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_lines.return_value = iter(lines)
+    return response
+
+
+class TestStreamingCalls:
+    """Test streamed LLM API calls"""
+
+    def test_stream_is_joined(self, llm_service):
+        """Test that streamed fragments are concatenated"""
+        with patch('llm_services.llm_service.requests.post', return_value=_stream_response(['Hel', 'lo'])):
+            assert llm_service._call_llm('prompt') == 'Hello'
+
+    def test_stream_stops_after_json_array(self, llm_service):
+        """Test that reading stops once the first JSON array is complete"""
+        fragments = ['Sure: [', '{"a": 1}', ']', ' and some trailing prose', ' that is never read']
+        mock_response = _stream_response(fragments)
+        with patch('llm_services.llm_service.requests.post', return_value=mock_response) as mock_post:
+            result = llm_service._call_llm('prompt', stop_on_json_array=True)
+        assert result == 'Sure: [{"a": 1}]'
+        assert mock_post.call_args.kwargs['stream'] is True
+        # The remaining fragments were left unread
+        assert len(list(mock_response.iter_lines.return_value)) == 3
+
+    def test_generation_deadline(self, llm_service):
+        """Test that a slow stream is cut off once the overall timeout has passed"""
+        clock = iter([100.0, 101.0, 200.0])
+        with patch('llm_services.llm_service.requests.post', return_value=_stream_response(['a', 'b', 'c'])), \
+                patch('llm_services.llm_service.time.monotonic', side_effect=lambda: next(clock)):
+            with pytest.raises(requests.Timeout):
+                llm_service._call_llm('prompt', timeout=30)
+
+    def test_stream_error_not_rewrapped(self, llm_service):
+        """Test that an error line in the stream surfaces with its own message"""
+        response = _stream_response([])
+        response.iter_lines.return_value = iter([json.dumps({'error': 'model not found'}).encode()])
+        with patch('llm_services.llm_service.requests.post', return_value=response):
+            with pytest.raises(LLMServiceError) as excinfo:
+                llm_service._call_llm('prompt')
+        assert str(excinfo.value) == 'LLM API returned an error: model not found'
+
+    def test_context_fixed_across_calls(self, llm_service):
+        """Test that num_predict follows the output budget while num_ctx stays the same"""
+        with patch('llm_services.llm_service.requests.post', return_value=_stream_response(['Food'])) as mock_post:
+            llm_service._call_llm('x' * 100, max_output=8)
+        short_options = json.loads(mock_post.call_args.kwargs['data'])['options']
+        with patch('llm_services.llm_service.requests.post', return_value=_stream_response(['[]'])) as mock_post:
+            llm_service._call_llm('x' * 9000, max_output=2048)
+        long_options = json.loads(mock_post.call_args.kwargs['data'])['options']
+        assert short_options['num_predict'] == 8
+        assert long_options['num_predict'] == 2048
+        assert short_options['num_ctx'] == long_options['num_ctx'] == 8192
+
+
+class TestStructuredOutput:
+    """Test schema-constrained LLM calls"""
+
+    def test_category_schema_sent_and_decoded(self, llm_service):
+        """Test that categorization requests a category enum and decodes the JSON string"""
+        with patch('llm_services.llm_service.requests.post',
+                   return_value=_stream_response(['"Food ', '& Dining"'])) as mock_post:
+            assert llm_service.categorize_transaction('SWIGGY', 250.0) == 'Food & Dining'
+        assert 'Food & Dining' in json.loads(mock_post.call_args.kwargs['data'])['format']['enum']
+
+    def test_clean_array_skips_repair(self, llm_service):
+        """Test that a well-formed array response is used without sanitizing"""
+        fragments = ['[{"date": "2025-03-01", "description": "ATM", "amount": 10, "type": "debit"}]']
+        with patch('llm_services.llm_service.requests.post', return_value=_stream_response(fragments)), \
+                patch.object(llm_service, '_repair_json_response') as mock_repair:
+            transactions = llm_service._parse_chunk('01/03/2025 ATM 10.00', 'HDFC', 1, 1)
+        assert transactions[0]['amount'] == 10.0
+        mock_repair.assert_not_called()
+
+    def test_unrepairable_response_raises_service_error(self, llm_service):
+        """Test that a JSON error from the repair passes surfaces as LLMServiceError"""
+        with patch('llm_services.llm_service.requests.post', return_value=_stream_response(['not json'])), \
+                patch.object(llm_service, '_repair_json_response',
+                             side_effect=json.JSONDecodeError('Expecting value', 'not json', 0)):
+            with pytest.raises(LLMServiceError, match='invalid JSON'):
+                llm_service._parse_chunk('01/03/2025 ATM 10.00', 'HDFC', 1, 1)
+
+
+def _http_error_response(status_code):
+    """Build a mock response whose raise_for_status fails with the given status"""
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.raise_for_status.side_effect = requests.HTTPError(response=MagicMock(status_code=status_code))
+    return response
+
+
+class TestRetryBehaviour:
+    """Test retry, backoff and cooldown handling"""
+
+    def test_client_error_is_not_retried(self, llm_service):
+        """Test that a 4xx response fails on the first attempt"""
+        with patch('llm_services.llm_service.requests.post', return_value=_http_error_response(404)) as mock_post, \
+                patch('llm_services.llm_service.time.sleep'):
+            with pytest.raises(LLMServiceError):
+                llm_service._call_llm_with_retry('prompt')
+        assert mock_post.call_count == 1
+
+    def test_server_error_is_retried_then_cools_down(self, llm_service):
+        """Test that 5xx responses are retried and exhausting retries starts a cooldown"""
+        with patch('llm_services.llm_service.requests.post', return_value=_http_error_response(503)) as mock_post, \
+                patch('llm_services.llm_service.time.sleep') as mock_sleep:
+            with pytest.raises(LLMServiceError):
+                llm_service._call_llm_with_retry('prompt')
+            assert mock_post.call_count == llm_service.max_retries + 1
+            assert all(call.args[0] <= llm_service.max_backoff for call in mock_sleep.call_args_list)
+
+            # While cooling down the endpoint is not contacted at all
+            with pytest.raises(LLMServiceError, match='cooling down'):
+                llm_service._call_llm_with_retry('prompt')
+            assert mock_post.call_count == llm_service.max_retries + 1
+
+
+class TestBatchCategorization:
+    """Test grouped categorization of many transactions"""
+
+    def test_repeated_merchants_share_one_call(self, llm_service):
+        """Test that descriptions differing only by reference numbers are categorized once"""
+        transactions = [
+            {'description': 'UPI-SWIGGY-412345678', 'amount': 250},
+            {'description': 'UPI-SWIGGY-498765432', 'amount': 310},
+            {'description': 'ATM WDL 12/03/2025 001234', 'amount': 2000},
+            {'description': 'upi-swiggy-400000001', 'amount': 99},
+        ]
+        with patch.object(llm_service, 'categorize_transaction', side_effect=['Food & Dining', 'Other']) as mock_cat:
+            categories = llm_service.categorize_transactions(transactions)
+        assert categories == ['Food & Dining', 'Food & Dining', 'Other', 'Food & Dining']
+        assert mock_cat.call_count == 2
+
+    def test_failed_group_is_none(self, llm_service):
+        """Test that a failed LLM call leaves only its own group uncategorized"""
+        transactions = [{'description': 'SWIGGY', 'amount': 1}, {'description': 'UBER', 'amount': 2}]
+        with patch.object(llm_service, 'categorize_transaction',
+                          side_effect=[LLMServiceError('boom'), 'Transportation']):
+            assert llm_service.categorize_transactions(transactions) == [None, 'Transportation']
+
+
+class TestDeduplication:
+    """Test merging of transactions parsed from overlapping chunks"""
+
+    def test_duplicates_removed_and_sorted(self, llm_service):
+        """Test that repeated rows collapse and the result is in date order"""
+        transactions = [
+            {'date': '2025-03-02', 'description': 'B', 'amount': 2.0, 'type': 'debit'},
+            {'date': '2025-03-01', 'description': 'A', 'amount': 1.0, 'type': 'debit'},
+            {'date': '2025-03-02', 'description': 'B', 'amount': 2.0, 'type': 'debit'},
+        ]
+        result = llm_service._deduplicate_transactions(transactions)
+        assert [t['description'] for t in result] == ['A', 'B']
+
+    def test_same_day_rows_keep_statement_order(self, llm_service):
+        """Test that same-day transactions aren't reordered by description"""
+        transactions = [
+            {'date': '2025-03-02', 'description': 'ZOMATO', 'amount': 300.0, 'type': 'debit'},
+            {'date': '2025-03-01', 'description': 'SALARY', 'amount': 5000.0, 'type': 'credit'},
+            {'date': '2025-03-02', 'description': 'AMAZON', 'amount': 100.0, 'type': 'debit'},
+            {'date': '2025-03-02', 'description': 'ZOMATO', 'amount': 300.0, 'type': 'debit'},
+        ]
+        result = llm_service._deduplicate_transactions(transactions)
+        assert [t['description'] for t in result] == ['SALARY', 'ZOMATO', 'AMAZON']
+
+    def test_unorderable_values_keep_input_order(self, llm_service):
+        """Test that mixed key types still dedupe without raising"""
+        transactions = [
+            {'date': '2025-03-02', 'description': 'B', 'amount': 2.0},
+            {'date': None, 'description': 'A', 'amount': 1.0},
+            {'date': '2025-03-02', 'description': 'B', 'amount': 2.0},
+        ]
+        result = llm_service._deduplicate_transactions(transactions)
+        assert [t['description'] for t in result] == ['B', 'A']
+
+
+class TestChunking:
+    """Test splitting long statements into LLM-sized chunks"""
+
+    def test_chunks_end_on_line_breaks(self):
+        """Test that rows are not split across chunks"""
+        text = ''.join(f'{i:02d}/03/2025 PAYMENT {i:04d} 100.00 Dr\n' for i in range(1, 29))
+        chunks = list(_iter_chunks(text, 200))
+        assert ''.join(chunks) == text
+        assert all(len(chunk) <= 200 and chunk.endswith('\n') for chunk in chunks)
+
+    def test_long_line_is_cut_at_limit(self):
+        """Test that text without usable line breaks falls back to fixed-size cuts"""
+        assert [len(c) for c in _iter_chunks('x' * 250, 100)] == [100, 100, 50]
+
+
+class TestKnownFormatBypass:
+    """Test the regex fast path for fixed statement layouts"""
+
+    def test_hdfc_credit_card_skips_llm(self, llm_service):
+        """Test that an HDFC credit card statement in the known layout is parsed without the LLM"""
+        pdf_text = (
+            "HDFC Bank Credit Card Statement\n"
+            "01/03/2025 12:34:56 AMAZON PAY INDIA 1,299.00\n"
+            "05/03/2025 PAYMENT RECEIVED - THANK YOU 15,000.00 Cr\n"
+        )
+        with patch.object(llm_service, '_parse_chunk') as mock_parse:
+            transactions = llm_service.parse_bank_statement(pdf_text, 'HDFC Credit Card')
+        mock_parse.assert_not_called()
+        assert transactions == [
+            {'date': '2025-03-01', 'description': 'AMAZON PAY INDIA', 'amount': 1299.0, 'type': 'debit'},
+            {'date': '2025-03-05', 'description': 'PAYMENT RECEIVED - THANK YOU', 'amount': 15000.0, 'type': 'credit'},
+        ]
+
+    def test_unrecognized_row_falls_back_to_llm(self, llm_service):
+        """Test that one row outside the known layout sends the whole statement to the LLM"""
+        pdf_text = "01/03/2025 AMAZON PAY INDIA 1,299.00\n02/03/2025 SALARY\n"
+        with patch.object(llm_service, '_parse_chunk', return_value=[]) as mock_parse:
+            llm_service.parse_bank_statement(pdf_text, 'HDFC Credit Card')
+        mock_parse.assert_called_once()
+
+    def test_second_amount_column_is_not_parsed(self):
+        """Test that a row with a trailing balance isn't read as a single-amount row"""
+        pdf_text = "01/03/2025 AMAZON PAY INDIA 1,299.00 10,250.00 Cr\n"
+        assert parse_known_format(pdf_text, 'HDFC Credit Card') is None
+
+    def test_federal_bank_uses_llm(self, llm_service):
+        """Test that Federal Bank rows with a running balance are left to the LLM"""
+        pdf_text = "01/03/2025 UPI/SWIGGY/4123 250.00 10,250.00 Cr\n"
+        assert parse_known_format(pdf_text, 'Federal Bank') is None
+        with patch.object(llm_service, '_parse_chunk', return_value=[]) as mock_parse:
+            llm_service.parse_bank_statement(pdf_text, 'Federal Bank')
+        mock_parse.assert_called_once()
+
+
+class TestChatQuery:
+    """Test the transaction summary sent with chat queries"""
+
+    def test_summary_totals(self, llm_service):
+        """Test that credits and debits are totalled in the prompt"""
+        transactions = [
+            {'amount': 1000.0, 'type': 'credit'},
+            {'amount': 250.0, 'type': 'debit'},
+            {'amount': 50.0, 'type': 'debit'},
+            {'type': 'unknown'},
+        ]
+        with patch.object(llm_service, '_call_llm_with_retry', return_value='ok') as mock_call:
+            assert llm_service.chat_query('How much did I spend?', transactions) == 'ok'
+        prompt = mock_call.call_args.args[0]
+        assert 'Total income: ₹1,000.00' in prompt
+        assert 'Total expenses: ₹300.00' in prompt
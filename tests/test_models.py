@@ -0,0 +1,360 @@
+"""
+Test Models
+Tests for model helpers that run against the in-memory SQLite test database.
+"""
+
+import importlib.util
+import os
+import threading
+import uuid
+from datetime import date, datetime
+
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from models.models import db, Account, AuditLog, Category, Transaction, _uuid7
+from models.secure_transaction import SecureTransaction
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations', 'versions')
+
+
+def _load_migration(filename):
+    """Import an Alembic revision module by file name"""
+    spec = importlib.util.spec_from_file_location(filename[:-3], os.path.join(MIGRATIONS_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def session(app):
+    """Database session that leaves every table empty after the test"""
+    yield db.session
+    db.session.rollback()
+    for table in reversed(db.metadata.sorted_tables):
+        db.session.execute(table.delete())
+    db.session.commit()
+
+
+@pytest.fixture
+def account(session):
+    """Account the test transactions belong to"""
+    account = Account(name='Test Savings', bank='HDFC', account_type='Savings Account')
+    session.add(account)
+    session.commit()
+    return account
+
+
+class TestTransactionAmount:
+    """Test the amount property over the integer cents column"""
+
+    @pytest.mark.parametrize('value, cents', [
+        (10, 1000),
+        (0.1 + 0.2, 30),
+        (1.005, 101),
+        (-1.005, -101),
+        (78791.65, 7879165),
+        ('12.345', 1235),
+        (None, None),
+    ])
+    def test_to_cents_rounds_half_up(self, value, cents):
+        """Test that amounts round half away from zero, using the decimal text of floats"""
+        assert Transaction.to_cents(value) == cents
+
+    def test_amount_round_trips_through_cents(self, session, account):
+        """Test that the stored cents read back as the same amount"""
+        transaction = Transaction(date=date(2025, 3, 1), description='ATM', amount=-250.5, account_id=account.id)
+        session.add(transaction)
+        session.commit()
+        session.expire(transaction)
+        assert (transaction.amount_cents, transaction.amount) == (-25050, -250.5)
+
+
+class TestTransactionParseCaches:
+    """Test the per-instance caches for the JSON columns"""
+
+    def test_tags_cache_follows_reassignment(self):
+        """Test that assigning a new tags value replaces the cached dictionary"""
+        transaction = Transaction(tags='{"categories": ["Food"]}')
+        assert transaction.get_tags() is transaction.get_tags()
+        transaction.tags = '{"categories": ["Travel"]}'
+        assert transaction.get_tags() == {'categories': ['Travel']}
+        transaction.tags = None
+        assert transaction.get_tags() == {}
+
+    def test_tag_edits_leave_caller_dicts_alone(self):
+        """Test that set_tags and add_tag never share a dictionary with the caller"""
+        transaction = Transaction()
+        tags = {'categories': ['Food']}
+        transaction.set_tags(tags)
+        tags['categories'].append('Travel')
+        assert transaction.get_tags() == {'categories': ['Food']}
+
+        before = transaction.get_tags()
+        transaction.add_tag('categories', 'Travel')
+        transaction.remove_tag('categories', 'Food')
+        assert before == {'categories': ['Food']}
+        assert transaction.get_tags() == Transaction.parse_tags(transaction.tags) == {'categories': ['Travel']}
+
+    def test_metadata_setter_primes_cache(self):
+        """Test that set_processing_metadata is read back without reparsing and reassignment invalidates it"""
+        transaction = Transaction()
+        metadata = {'parser': 'llm', 'pages': [1]}
+        transaction.set_processing_metadata(metadata)
+        metadata['pages'].append(2)
+        assert transaction.get_processing_metadata() == {'parser': 'llm', 'pages': [1]}
+        assert transaction.get_processing_metadata() is transaction.get_processing_metadata()
+        transaction.processing_metadata = '{"parser": "regex"}'
+        assert transaction.get_processing_metadata() == {'parser': 'regex'}
+
+    def test_category_setters_copy_input(self):
+        """Test that set_keywords and set_subcategories cache copies of the caller's objects"""
+        category = Category(name='Food')
+        keywords = ['swiggy']
+        subcategories = {'Delivery': ['swiggy']}
+        category.set_keywords(keywords)
+        category.set_subcategories(subcategories)
+        keywords.append('zomato')
+        subcategories['Delivery'].append('zomato')
+        assert category.get_keywords() == ['swiggy']
+        assert category.get_subcategories() == {'Delivery': ['swiggy']}
+
+    def test_row_and_instance_serialize_alike(self, session, account):
+        """Test that dict_from_row over select_with_account matches to_dict"""
+        transaction = Transaction(date=date(2025, 3, 1), description='ATM', amount=-10, account_id=account.id,
+                                  tags='{"categories": ["Cash"]}')
+        session.add(transaction)
+        session.commit()
+        row = session.execute(Transaction.select_with_account()).one()
+        assert Transaction.dict_from_row(row) == transaction.to_dict()
+
+
+class TestUUID7:
+    """Test the time-ordered audit log IDs"""
+
+    def test_version_and_variant_bits(self):
+        """Test that generated IDs are RFC 4122 version 7 UUIDs"""
+        value = _uuid7()
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+
+    def test_ids_ordered_by_time(self, monkeypatch):
+        """Test that IDs from later milliseconds sort after earlier ones"""
+        clock = iter([1_700_000_000_000_000_000, 1_700_000_000_001_000_000, 1_700_000_000_002_000_000])
+        monkeypatch.setattr('models.models.time.time_ns', lambda: next(clock))
+        ids = [str(_uuid7()) for _ in range(3)]
+        assert ids == sorted(ids)
+        assert uuid.UUID(ids[0]).int >> 80 == 1_700_000_000_000
+
+
+class TestDedupHash:
+    """Test the hash behind the unique_transaction constraint"""
+
+    def test_date_forms_hash_alike(self):
+        """Test that a date, a datetime and ISO strings for the same day give one hash"""
+        hashes = {
+            Transaction.compute_dedup_hash(value, 'ATM', 1000, 1)
+            for value in (date(2025, 3, 1), datetime(2025, 3, 1, 14, 30), '2025-03-01', '2025-03-01T00:00:00')
+        }
+        assert len(hashes) == 1
+
+    def test_listener_sets_and_refreshes_hash(self, session, account):
+        """Test that flushing a transaction fills dedup_hash and an edit recomputes it"""
+        transaction = Transaction(date=date(2025, 3, 1), description='ATM', amount=10, account_id=account.id)
+        session.add(transaction)
+        session.commit()
+        assert transaction.dedup_hash == Transaction.compute_dedup_hash(date(2025, 3, 1), 'ATM', 1000, account.id)
+
+        transaction.amount = 12.5
+        session.commit()
+        assert transaction.dedup_hash == Transaction.compute_dedup_hash(date(2025, 3, 1), 'ATM', 1250, account.id)
+
+    def test_backfill_matches_model_hash(self):
+        """Test that revision c4d1e8a7b3f2 backfills the same hash the model computes"""
+        migration = _load_migration('c4d1e8a7b3f2_add_transaction_dedup_hash.py')
+        rows = [
+            {'id': 1, 'date': date(2025, 3, 1), 'description': 'ATM', 'amount_cents': 1000, 'account_id': 1},
+            {'id': 2, 'date': date(2025, 3, 2), 'description': 'UPI/SWIGGY', 'amount_cents': -25050, 'account_id': 2},
+        ]
+        metadata = sa.MetaData()
+        transactions = sa.Table(
+            'transactions', metadata,
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('date', sa.Date, nullable=False),
+            sa.Column('description', sa.String(500), nullable=False),
+            sa.Column('amount_cents', sa.BigInteger, nullable=False),
+            sa.Column('account_id', sa.Integer, nullable=False),
+            sa.UniqueConstraint('date', 'description', 'amount_cents', 'account_id', name='unique_transaction'),
+        )
+        engine = sa.create_engine('sqlite://')
+        metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(transactions.insert(), rows)
+            with Operations.context(MigrationContext.configure(conn)):
+                migration.upgrade()
+            backfilled = dict(conn.execute(sa.text('SELECT id, dedup_hash FROM transactions')).all())
+
+        assert backfilled == {
+            row['id']: Transaction.compute_dedup_hash(row['date'], row['description'], row['amount_cents'], row['account_id'])
+            for row in rows
+        }
+
+
+class TestBulkIngest:
+    """Test the executemany insert path used by statement uploads"""
+
+    def _row(self, account, description='ATM', amount=-10.0, **extra):
+        return dict(date=date(2025, 3, 1), description=description, amount=amount,
+                    account_id=account.id, is_debit=amount < 0, **extra)
+
+    def test_batch_duplicates_keep_first(self, session, account):
+        """Test that repeats within one batch collapse onto the first row"""
+        rows = [self._row(account, category='Cash'), self._row(account, category='Other')]
+        assert Transaction.bulk_ingest(rows) == 1
+        session.commit()
+        assert [t.category for t in Transaction.query.all()] == ['Cash']
+
+    def test_existing_rows_skipped(self, session, account):
+        """Test that rows already in the database are not inserted again"""
+        session.add(Transaction(**self._row(account)))
+        session.commit()
+        assert Transaction.bulk_ingest([self._row(account), self._row(account, description='UPI')]) == 1
+        session.commit()
+        assert Transaction.query.count() == 2
+
+    def test_core_insert_fills_derived_columns(self, session, account):
+        """Test that amount_cents, dedup_hash and JSON tags are set without the ORM setters"""
+        Transaction.bulk_ingest([self._row(account, amount=-10.005, tags={'categories': ['Cash']})])
+        session.commit()
+        transaction = Transaction.query.one()
+        assert transaction.amount_cents == -1001
+        assert transaction.dedup_hash == Transaction.compute_dedup_hash(date(2025, 3, 1), 'ATM', -1001, account.id)
+        assert transaction.get_tags() == {'categories': ['Cash']}
+
+
+class TestSecureBulkStore:
+    """Test storing a batch of encrypted transactions"""
+
+    def test_bulk_store_encrypts_and_audits(self, session, account):
+        """Test encryption fields, the duplicate count and the audit entries of one batch"""
+        secure = SecureTransaction()
+        rows = [
+            {'date': date(2025, 3, 1), 'description': 'ATM', 'amount': -10.0, 'account_id': account.id,
+             'tags': '{"categories": ["Cash"]}'},
+            {'date': date(2025, 3, 2), 'description': 'Salary', 'amount': 5000.0, 'account_id': account.id,
+             'tags': {'categories': ['Income']}},
+        ]
+        assert secure.store_transactions_encrypted_bulk(rows + rows[:1], user_id='user-1', trace_id='trace-1') == 2
+
+        transactions = Transaction.query.order_by(Transaction.date).all()
+        atm = transactions[0]
+        assert atm.is_encrypted and atm.encryption_key_id == secure.encryption_key_id
+        decrypted = secure.encryption.decrypt_sensitive_fields(
+            {'_encrypted': True, 'description': atm.encrypted_description, 'amount': atm.encrypted_amount}
+        )
+        assert decrypted == {'description': 'ATM', 'amount': -10.0}
+        # JSON string tags are stored as given, not encoded a second time
+        assert [t.get_tags() for t in transactions] == [{'categories': ['Cash']}, {'categories': ['Income']}]
+
+        audit = {entry.action: entry.get_metadata() for entry in AuditLog.query.filter_by(trace_id='trace-1')}
+        assert audit['transaction_bulk_create_attempt']['count'] == 3
+        assert (audit['transactions_bulk_created']['count'],
+                audit['transactions_bulk_created']['duplicate_count']) == (2, 1)
+
+
+    def test_background_store_inserts_once(self, session, account):
+        """Test that the background upload path stores parsed rows through the bulk insert"""
+        from background_tasks import store_transactions_in_db
+
+        parsed = [
+            {'date': '2025-03-01', 'description': 'ATM', 'amount': 10.0, 'type': 'debit'},
+            {'date': '02/03/2025', 'description': 'Salary', 'amount': 5000.0, 'type': 'credit'},
+        ]
+        assert store_transactions_in_db(parsed + parsed[:1], account.id, 'trace-4') == 2
+        transactions = Transaction.query.order_by(Transaction.date).all()
+        assert [t.date for t in transactions] == [date(2025, 3, 1), date(2025, 3, 2)]
+        assert all(t.is_encrypted and t.trace_id == 'trace-4' for t in transactions)
+
+
+class TestListingIndexes:
+    """Test that create_all builds the same listing indexes as migration 3b7e2c9a1d44"""
+
+    @pytest.mark.parametrize('table, expected, dropped', [
+        ('audit_logs',
+         {'idx_audit_logs_user_hash_ts', 'idx_audit_logs_action_ts', 'idx_audit_logs_entity_ts', 'idx_audit_logs_user_ts'},
+         {'user_id_hash', 'action', 'user_id'}),
+        ('chat_sessions', {'idx_chat_sessions_user_ts', 'idx_chat_sessions_session_id_partial'}, {'user_id'}),
+        ('llm_processing_logs', {'idx_llm_logs_type_ts'}, {'processing_type'}),
+    ])
+    def test_composites_replace_single_column_indexes(self, app, table, expected, dropped):
+        """Test that the composites exist and the superseded single-column indexes don't"""
+        indexes = sa.inspect(db.engine).get_indexes(table)
+        assert expected <= {index['name'] for index in indexes}
+        single_columns = {index['column_names'][0] for index in indexes if len(index['column_names']) == 1}
+        assert not dropped & single_columns
+
+
+class TestAuditLogWrites:
+    """Test the column values written for audit entries"""
+
+    def test_user_hash_written_without_legacy_fields(self, session):
+        """Test that user_id_hash is filled while the other legacy columns are skipped"""
+        entry = AuditLog.log_action('login', user_id='user-1', ip_address='10.0.0.1',
+                                    entity_type='transaction', entity_id=5, metadata={'k': 1})
+        session.commit()
+        assert entry.user_id_hash == AuditLog.hash_sensitive_data('user-1')
+        assert entry.ip_address_hash is None
+        assert entry.details is None
+        assert entry.resource_type is None
+        assert entry.get_metadata() == {'k': 1}
+
+    def test_legacy_fields_written_when_enabled(self, app, session):
+        """Test that the config flag restores the hashed and duplicated columns"""
+        app.config['WRITE_LEGACY_AUDIT_FIELDS'] = True
+        try:
+            entry = AuditLog.log_action('login', user_id='user-1', ip_address='10.0.0.1',
+                                        entity_type='transaction', entity_id=5)
+        finally:
+            app.config['WRITE_LEGACY_AUDIT_FIELDS'] = False
+        assert entry.ip_address_hash == AuditLog.hash_sensitive_data('10.0.0.1')
+        assert (entry.resource_type, entry.resource_id) == ('transaction', '5')
+
+    def test_bulk_rows_match_single_writes(self, session):
+        """Test that log_actions_bulk stores the same values log_action would"""
+        count = AuditLog.log_actions_bulk([
+            {'action': 'flagged', 'user_id': 7, 'trace_id': 'trace-2', 'entity_type': 'transaction',
+             'entity_id': 42, 'metadata': {'reason': 'large amount'}},
+            {'action': 'flagged', 'user_id': 7, 'trace_id': 'trace-2', 'success': False, 'error_message': 'boom'},
+        ])
+        session.commit()
+        assert count == 2
+        first, second = AuditLog.query.filter_by(trace_id='trace-2').order_by(AuditLog.success.desc()).all()
+        assert (first.user_id, first.entity_type, first.entity_id) == ('7', 'transaction', '42')
+        assert first.get_metadata() == {'reason': 'large amount'}
+        assert first.user_id_hash == AuditLog.hash_sensitive_data(7)
+        assert first.details is None and first.timestamp is not None
+        assert (second.success, second.error_message) == (False, 'boom')
+        assert uuid.UUID(first.id).version == 7
+
+    def test_failed_batch_is_rolled_back(self, session):
+        """Test that a failed bulk insert propagates and AuditService leaves the session usable"""
+        from services import AuditService
+
+        with pytest.raises(sa.exc.IntegrityError):
+            AuditLog.log_actions_bulk([{'action': None}])
+        session.rollback()
+
+        assert AuditService.log_actions('trace-3', 'user-1', [('ok', None), (None, None)]) == 0
+        assert AuditService.log_actions('trace-3', 'user-1', [('ok', None)]) == 1
+        assert AuditLog.query.filter_by(trace_id='trace-3').count() == 1
+
+    def test_values_built_outside_app_context(self):
+        """Test that audit values don't need an app context, as in background threads"""
+        results = []
+        thread = threading.Thread(target=lambda: results.append(AuditLog._action_values('sync', user_id='u')))
+        thread.start()
+        thread.join()
+        assert results[0]['user_id_hash'] == AuditLog.hash_sensitive_data('u')
+        assert 'details' not in results[0]
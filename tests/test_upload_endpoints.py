@@ -165,6 +165,33 @@ class TestTransactionConfirmation:
         assert valid_transaction['type'] in ['debit', 'credit']
         assert isinstance(valid_transaction['confirmed'], bool)
 
+    
+    def test_confirm_reports_duplicates(self, client):
+        """Test that confirming skips rows already saved and reports them"""
+        from models.models import db, Transaction
+        
+        payload = {
+            'transactions': [
+                {'date': '2024-01-15', 'description': 'Test Transaction', 'amount': -100.00,
+                 'bank': 'HDFC', 'account_type': 'Savings Account'},
+                {'date': '15/01/2024', 'description': 'Test Transaction', 'amount': -100.00,
+                 'bank': 'HDFC', 'account_type': 'Savings Account'},
+                {'date': '2024-01-16', 'description': 'Salary', 'amount': 5000.00,
+                 'bank': 'HDFC', 'account_type': 'Savings Account'},
+            ]
+        }
+        try:
+            first = client.post('/api/upload/confirm', json=payload).get_json()
+            second = client.post('/api/upload/confirm', json=payload).get_json()
+            
+            assert (first['transaction_count'], first['duplicate_count']) == (2, 1)
+            assert (second['transaction_count'], second['duplicate_count']) == (0, 3)
+            assert Transaction.query.count() == 2
+        finally:
+            db.session.rollback()
+            for table in reversed(db.metadata.sorted_tables):
+                db.session.execute(table.delete())
+            db.session.commit()
 
 class TestErrorHandling:
     """Test error handling scenarios"""